@@ -1,5 +1,7 @@
 import os
 import sys
+import json
+import hashlib
 import click
 
 try:
@@ -7,7 +9,7 @@ try:
 except ImportError:
     import configparser
 
-kamcli_formats_list = ["raw", "json", "table", "dict", "yaml"]
+kamcli_formats_list = ["raw", "json", "table", "dict", "yaml", "ndjson", "csv"]
 
 COMMAND_ALIASES = {
     "acl": "group",
@@ -72,6 +74,11 @@ class Context(object):
         self.wdir = os.getcwd()
         self.gconfig_paths = []
         self._gconfig = None
+        self.rpcconn = None
+        self.rpcfbconn = None
+        self.rpcbatch = True
+        self.dbengines = {}
+        self.dbroindex = None
 
     def log(self, msg, *args):
         """Logs a message to stderr."""
@@ -110,6 +117,41 @@ class Context(object):
             self._gconfig = read_global_config(self.gconfig_paths)
         return self._gconfig
 
+    def dbengine(self, urlname="rwurl", url=None):
+        """Return the database engine for a db url, created on first use
+
+        \b
+        Parameters:
+          - urlname: name of the url attribute in db config section (e.g.,
+                     rwurl, rourl, adminurl)
+          - url: database url to be used instead of urlname
+        The engines are kept per url, so the database commands (also many
+        of them run from the interactive shell) reuse the connections from
+        the pool of the engine.
+        """
+        if url is None:
+            url = self.gconfig.get("db", urlname)
+        if url not in self.dbengines:
+            from kamcli.dbutils import dbutils_create_engine
+            from kamcli.dbutils import dbutils_engine_options
+
+            self.dbengines[url] = dbutils_create_engine(
+                url, **dbutils_engine_options(self, url)
+            )
+        return self.dbengines[url]
+
+    def dbroengine(self):
+        """Return the database engine for read only queries
+
+        \b
+        It is the engine of rourl or of one of the replicas in rourls (see
+        dbutils_roengine()), to avoid loading the main database with the
+        queries of show, list and report commands.
+        """
+        from kamcli.dbutils import dbutils_roengine
+
+        return dbutils_roengine(self)
+
 
 pass_context = click.make_pass_decorator(Context, ensure=True)
 cmd_folder = os.path.abspath(
@@ -117,14 +159,153 @@ cmd_folder = os.path.abspath(
 )
 
 
+##
+# format version of the commands index cache file
+KAMCLI_CMDINDEX_VERSION = 3
+
+
+def kamcli_cmdindex_path():
+    """Return the path of the commands index cache file
+
+    \b
+    The file is in ~/.kamcli/, its name includes a hash of the commands
+    folder path, so different installations do not overwrite each other.
+    """
+    return os.path.expanduser(
+        "~/.kamcli/cmdindex-"
+        + hashlib.md5(cmd_folder.encode()).hexdigest()[:12]
+        + ".json"
+    )
+
+
 class KamCLI(click.MultiCommand):
-    def list_commands(self, ctx):
-        rv = []
+    """Commands loaded from kamcli/commands/cmd_<name>.py files
+
+    \b
+    A command is run by importing only its module. The names and help texts
+    of the commands, as well as the command aliases, are kept in an index,
+    cached in ~/.kamcli/ and built again when a command file is added,
+    removed or modified. Listing the commands (help, shell completion) is
+    done without importing the modules of the commands.
+    """
+
+    cmdindex = None
+    cmdaliases = None
+
+    def command_files(self):
+        """Return the dictionary with the mtime of each command file"""
+        mtimes = {}
         for filename in os.listdir(cmd_folder):
             if filename.endswith(".py") and filename.startswith("cmd_"):
-                rv.append(filename[4:-3])
-        rv.sort()
-        return rv
+                mtimes[filename] = os.stat(
+                    os.path.join(cmd_folder, filename)
+                ).st_mtime_ns
+        return mtimes
+
+    def command_index_write(self, ipath, idata):
+        """Write the commands index cache file (if possible)"""
+        try:
+            os.makedirs(os.path.dirname(ipath), exist_ok=True)
+            tpath = ipath + "." + str(os.getpid())
+            with open(tpath, "w") as ifile:
+                json.dump(idata, ifile)
+            os.replace(tpath, ipath)
+        except OSError:
+            pass  # keep the index only in memory
+
+    def command_index(self, ctx):
+        """Return the dictionary with the details of the commands
+
+        \b
+        Each item is indexed by command name and has the attributes
+        short_help, help and hidden, or it is None if the module of the
+        command cannot be loaded. The aliases of the commands in the index
+        (built-in and from cmdaliases config section) are stored in
+        cmdaliases attribute, the cache file being updated when they change.
+        """
+        if self.cmdindex is not None:
+            return self.cmdindex
+        mtimes = self.command_files()
+        ipath = kamcli_cmdindex_path()
+        idata = None
+        try:
+            with open(ipath, "r") as ifile:
+                idata = json.load(ifile)
+            if (
+                idata.get("version") != KAMCLI_CMDINDEX_VERSION
+                or idata.get("folder") != cmd_folder
+                or idata.get("mtimes") != mtimes
+            ):
+                idata = None
+        except (OSError, ValueError, AttributeError):
+            idata = None
+        if idata is None:
+            commands = {}
+            for filename in sorted(mtimes.keys()):
+                name = filename[4:-3]
+                cmd = self.get_command(ctx, name)
+                if cmd is None:
+                    commands[name] = None
+                else:
+                    commands[name] = {
+                        "short_help": cmd.short_help,
+                        "help": cmd.help,
+                        "hidden": cmd.hidden,
+                    }
+            idata = {
+                "version": KAMCLI_CMDINDEX_VERSION,
+                "folder": cmd_folder,
+                "mtimes": mtimes,
+                "commands": commands,
+                "aliases": None,
+            }
+        self.cmdindex = idata["commands"]
+        self.cmdaliases = {
+            a: t
+            for a, t in COMMAND_ALIASES.items()
+            if a not in self.cmdindex and self.cmdindex.get(t) is not None
+        }
+        if idata["aliases"] != self.cmdaliases:
+            idata["aliases"] = self.cmdaliases
+            self.command_index_write(ipath, idata)
+        return self.cmdindex
+
+    def list_commands(self, ctx):
+        cindex = self.command_index(ctx)
+        return sorted(list(cindex.keys()) + list(self.cmdaliases.keys()))
+
+    def command_short_help(self, ctx, name, limit=45):
+        """Return the short help of a command or alias from the index"""
+        cindex = self.command_index(ctx)
+        if name in self.cmdaliases:
+            return "Alias of " + self.cmdaliases[name]
+        cinfo = cindex.get(name)
+        if cinfo is None:
+            return None
+        if cinfo["short_help"]:
+            return cinfo["short_help"]
+        return click.utils.make_default_short_help(cinfo["help"] or "", limit)
+
+    def format_commands(self, ctx, formatter):
+        cindex = self.command_index(ctx)
+        names = [
+            n
+            for n in sorted(cindex.keys())
+            if cindex[n] is not None and not cindex[n]["hidden"]
+        ]
+        if not names:
+            return
+        limit = formatter.width - 6 - max(len(n) for n in names)
+        rows = [(n, self.command_short_help(ctx, n, limit)) for n in names]
+        with formatter.section("Commands"):
+            formatter.write_dl(rows)
+        if self.cmdaliases:
+            rows = [
+                (a, self.command_short_help(ctx, a))
+                for a in sorted(self.cmdaliases.keys())
+            ]
+            with formatter.section("Command aliases"):
+                formatter.write_dl(rows)
 
     def get_command(self, ctx, name):
         if name in COMMAND_ALIASES:
@@ -1,11 +1,22 @@
+import os
+import sys
+import time
+import datetime
 import click
-from sqlalchemy import create_engine
 from kamcli.ioutils import ioutils_dbres_print
 from kamcli.ioutils import ioutils_dict_print
-from sqlalchemy.sql import text
-from sqlalchemy.exc import SQLAlchemyError
+from kamcli.ioutils import ioutils_dbrows_write
+from kamcli.ioutils import ioutils_file_open
+from kamcli.ioutils import IOUtilsRows
+from kamcli.ioexport import ioexport_group_count
+from kamcli.ioexport import ioexport_parquet_format
+from kamcli.ioexport import IOExportWriter
+from kamcli.ioexport import ioexport_arrow_types
 from kamcli.cli import pass_context
 from kamcli.dbutils import dbutils_exec_sqltext
+from kamcli.dbutils import dbutils_sql_hours_ago
+from kamcli.dbutils import dbutils_sql_time_bucket
+from kamcli.dbutils import DBUTILS_TIME_BUCKETS
 
 
 @click.group(
@@ -37,7 +48,7 @@ def acc_acc_struct_update_exec(ctx, e):
 def acc_acc_struct_update(ctx):
     """Run SQL statements to update acc table structure"""
     ctx.vlog("Run statements to update acc table structure")
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     acc_acc_struct_update_exec(ctx, e)
 
 
@@ -62,7 +73,7 @@ def acc_acc_struct_reset_exec(ctx, e):
 def acc_acc_struct_reset(ctx):
     """Run SQL statements to reset acc table structure"""
     ctx.vlog("Run statements to reset acc table structure")
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     acc_acc_struct_reset_exec(ctx, e)
 
 
@@ -87,7 +98,7 @@ def acc_mc_struct_update_exec(ctx, e):
 def acc_mc_struct_update(ctx):
     """Run SQL statements to update missed_calls table structure"""
     ctx.vlog("Run statements to update missed_calls table structure")
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     acc_mc_struct_update_exec(ctx, e)
 
 
@@ -112,7 +123,7 @@ def acc_mc_struct_reset_exec(ctx, e):
 def acc_mc_struct_reset(ctx):
     """Run SQL statements to reset missed_calls table structure"""
     ctx.vlog("Run statements to reset missed_calls table structure")
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     acc_mc_struct_reset_exec(ctx, e)
 
 
@@ -124,7 +135,7 @@ def acc_mc_struct_reset(ctx):
 def acc_tables_struct_update(ctx):
     """Run SQL statements to update acc and missed_calls tables structures"""
     ctx.vlog("Run statements to update acc and missed_calls tables structures")
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     acc_acc_struct_update_exec(ctx, e)
     acc_mc_struct_update_exec(ctx, e)
 
@@ -137,7 +148,7 @@ def acc_tables_struct_update(ctx):
 def acc_cdrs_table_create(ctx):
     """Run SQL statements to create cdrs table structure"""
     ctx.vlog("Run SQL statements to create cdrs table structure")
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     sqltext = """
       CREATE TABLE `cdrs` (
       `cdr_id` bigint(20) NOT NULL auto_increment,
@@ -172,7 +183,7 @@ def acc_cdrs_proc_create(ctx):
     ctx.vlog(
         "Run SQL statements to create the stored procedure to generate cdrs"
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     sqltext = """
       CREATE PROCEDURE `kamailio_cdrs`()
       BEGIN
@@ -223,7 +234,7 @@ def acc_cdrs_proc_create(ctx):
 def acc_rates_table_create(ctx):
     """Run SQL statements to create billing_rates table structure"""
     ctx.vlog("Run SQL statements to create billing_rates table structure")
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     sqltext = """
       CREATE TABLE `billing_rates` (
       `rate_id` bigint(20) NOT NULL auto_increment,
@@ -238,6 +249,58 @@ def acc_rates_table_create(ctx):
     e.execute(sqltext)
 
 
+def acc_list_records(
+    ctx,
+    oformat,
+    ostyle,
+    table,
+    idcolumn,
+    limit,
+    afterid,
+    beforeid,
+    interactive,
+):
+    """List the records of a table in pages of limit records
+
+    \b
+    The records are selected by id range (keyset pagination): with afterid,
+    the records with greater id in ascending order, otherwise the records
+    with lower id than beforeid (if set) in descending order. Each page
+    costs the same, whatever its position in the table. In interactive
+    mode, the next page starts after the last id of the previous one.
+    """
+    e = ctx.dbroengine()
+    while True:
+        query = "select * from {0}".format(table)
+        qconds = []
+        if afterid is not None:
+            qconds.append("{0} > {1}".format(idcolumn, int(afterid)))
+        if beforeid is not None:
+            qconds.append("{0} < {1}".format(idcolumn, int(beforeid)))
+        if qconds:
+            query += " where " + " and ".join(qconds)
+        if afterid is not None:
+            query += " order by {0} asc".format(idcolumn)
+        else:
+            query += " order by {0} desc".format(idcolumn)
+        if limit > 0:
+            query += " limit {0}".format(limit)
+        res = e.execute(query)
+        if not interactive or limit <= 0:
+            ioutils_dbres_print(ctx, oformat, ostyle, res)
+            return
+        rows = res.fetchall()
+        ioutils_dbres_print(
+            ctx, oformat, ostyle, IOUtilsRows(res.keys(), rows)
+        )
+        if len(rows) < limit or not click.confirm("Next page?", default=True):
+            return
+        if afterid is not None:
+            afterid = rows[-1][idcolumn]
+        else:
+            beforeid = rows[-1][idcolumn]
+
+
 @cli.command(
     "list",
     short_help="List accounting records",
@@ -246,7 +309,7 @@ def acc_rates_table_create(ctx):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -265,21 +328,48 @@ def acc_rates_table_create(ctx):
     default=20,
     help="The limit of listed records (default: 20)",
 )
+@click.option(
+    "afterid",
+    "--after-id",
+    type=int,
+    default=None,
+    help="List the records with greater id (ascending order)",
+)
+@click.option(
+    "beforeid",
+    "--before-id",
+    type=int,
+    default=None,
+    help="List the records with lower id",
+)
+@click.option(
+    "interactive",
+    "--interactive",
+    "-I",
+    is_flag=True,
+    help="Ask to list the next page of limit records",
+)
 @pass_context
-def acc_list(ctx, oformat, ostyle, limit):
+def acc_list(ctx, oformat, ostyle, limit, afterid, beforeid, interactive):
     """List accounting records
 
     \b
+    The records are listed by id, newest first, or oldest first after the
+    id given with --after-id. With --interactive, the next page of records
+    is listed on confirmation.
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
     ctx.vlog("Showing accounting records")
-    query = ""
-    if limit == 0:
-        query = "select * from acc order by id desc"
-    else:
-        query = "select * from acc order by id desc limit {0}".format(limit)
-    res = e.execute(query)
-    ioutils_dbres_print(ctx, oformat, ostyle, res)
+    acc_list_records(
+        ctx,
+        oformat,
+        ostyle,
+        "acc",
+        "id",
+        limit,
+        afterid,
+        beforeid,
+        interactive,
+    )
 
 
 @cli.command(
@@ -290,7 +380,7 @@ def acc_list(ctx, oformat, ostyle, limit):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -309,38 +399,485 @@ def acc_list(ctx, oformat, ostyle, limit):
     default=20,
     help="The limit of listed records (default: 20)",
 )
+@click.option(
+    "afterid",
+    "--after-id",
+    type=int,
+    default=None,
+    help="List the records with greater id (ascending order)",
+)
+@click.option(
+    "beforeid",
+    "--before-id",
+    type=int,
+    default=None,
+    help="List the records with lower id",
+)
+@click.option(
+    "interactive",
+    "--interactive",
+    "-I",
+    is_flag=True,
+    help="Ask to list the next page of limit records",
+)
 @pass_context
-def acc_mc_list(ctx, oformat, ostyle, limit):
+def acc_mc_list(ctx, oformat, ostyle, limit, afterid, beforeid, interactive):
     """List missed calls records
 
     \b
+    The records are listed by id, newest first, or oldest first after the
+    id given with --after-id. With --interactive, the next page of records
+    is listed on confirmation.
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
     ctx.vlog("Showing missed calls records")
-    query = ""
-    if limit == 0:
-        query = "select * from missed_calls order by id desc"
-    else:
-        query = "select * from missed_calls order by id desc limit {0}".format(
-            limit
+    acc_list_records(
+        ctx,
+        oformat,
+        ostyle,
+        "missed_calls",
+        "id",
+        limit,
+        afterid,
+        beforeid,
+        interactive,
+    )
+
+
+def acc_time_value(value):
+    """Return the datetime of a time column value (str for SQLite)"""
+    if isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.fromisoformat(str(value))
+
+
+def acc_cdrs_generate_chunk(ctx, c, invites):
+    """Generate the cdrs for a chunk of INVITE records
+
+    \b
+    The BYE records for all the INVITE records in the chunk are fetched
+    with one query and paired in memory by callid and tags (in any
+    direction), the earliest BYE being used. The cdrs are inserted with
+    one executemany and then the acc records are linked to them. Returns
+    the number of inserted cdrs and the list of INVITE records without BYE.
+    """
+    from sqlalchemy.sql import text
+    from sqlalchemy.sql import bindparam
+
+    callids = list({r["callid"] for r in invites})
+    byes = {}
+    res = c.execute(
+        text(
+            "SELECT callid, from_tag, to_tag, time FROM acc"
+            " WHERE method='BYE' AND callid IN :callids ORDER BY time"
+        ).bindparams(bindparam("callids", expanding=True)),
+        {"callids": callids},
+    )
+    for row in res:
+        byes.setdefault(row["callid"], []).append(
+            (row["from_tag"], row["to_tag"], row["time"])
         )
-    res = e.execute(query)
-    ioutils_dbres_print(ctx, oformat, ostyle, res)
+
+    qcdrs = text(
+        "SELECT cdr_id, sip_call_id, sip_from_tag, sip_to_tag FROM cdrs"
+        " WHERE sip_call_id IN :callids"
+    ).bindparams(bindparam("callids", expanding=True))
+    existing = set()
+    for row in c.execute(qcdrs, {"callids": callids}):
+        existing.add(
+            (row["sip_call_id"], row["sip_from_tag"], row["sip_to_tag"])
+        )
+
+    created = datetime.datetime.now().replace(microsecond=0)
+    cdrs = []
+    keys = set()
+    unpaired = []
+    for inv in invites:
+        key = (inv["callid"], inv["from_tag"], inv["to_tag"])
+        if key in keys or key in existing:
+            continue
+        for bye in byes.get(inv["callid"], []):
+            if (bye[0] == key[1] and bye[1] == key[2]) or (
+                bye[0] == key[2] and bye[1] == key[1]
+            ):
+                break
+        else:
+            unpaired.append(inv)
+            continue
+        keys.add(key)
+        duration = acc_time_value(bye[2]) - acc_time_value(inv["time"])
+        cdrs.append(
+            {
+                "src_username": inv["src_user"],
+                "src_domain": inv["src_domain"],
+                "dst_username": inv["dst_user"],
+                "dst_domain": inv["dst_domain"],
+                "dst_ousername": inv["dst_ouser"],
+                "call_start_time": inv["time"],
+                "duration": int(duration.total_seconds()),
+                "sip_call_id": key[0],
+                "sip_from_tag": key[1],
+                "sip_to_tag": key[2],
+                "src_ip": inv["src_ip"],
+                "created": created,
+            }
+        )
+    if cdrs:
+        c.execute(
+            text(
+                "INSERT INTO cdrs (src_username, src_domain, dst_username,"
+                " dst_domain, dst_ousername, call_start_time, duration,"
+                " sip_call_id, sip_from_tag, sip_to_tag, src_ip, created)"
+                " VALUES (:src_username, :src_domain, :dst_username,"
+                " :dst_domain, :dst_ousername, :call_start_time, :duration,"
+                " :sip_call_id, :sip_from_tag, :sip_to_tag, :src_ip,"
+                " :created)"
+            ),
+            cdrs,
+        )
+
+    # link the acc records of new and already existing cdrs
+    keys |= existing
+    links = []
+    if keys:
+        for row in c.execute(qcdrs, {"callids": callids}):
+            key = (row["sip_call_id"], row["sip_from_tag"], row["sip_to_tag"])
+            if key in keys:
+                links.append(
+                    {
+                        "cdr_id": row["cdr_id"],
+                        "callid": key[0],
+                        "from_tag": key[1],
+                        "to_tag": key[2],
+                    }
+                )
+    if links:
+        c.execute(
+            text(
+                "UPDATE acc SET cdr_id=:cdr_id WHERE callid=:callid"
+                " AND from_tag=:from_tag AND to_tag=:to_tag"
+            ),
+            links,
+        )
+    return len(cdrs), unpaired
+
+
+def acc_mark_get(c, name):
+    """Return the value of a mark from kamcli_marks table (None if not set)"""
+    from sqlalchemy.sql import text
+
+    row = c.execute(
+        text("SELECT mark_value FROM kamcli_marks WHERE mark_name=:name"),
+        {"name": name},
+    ).first()
+    if row is None:
+        return None
+    return int(row[0])
+
+
+def acc_mark_set(c, name, value):
+    """Store the value of a mark in kamcli_marks table"""
+    from sqlalchemy.sql import text
+
+    res = c.execute(
+        text(
+            "UPDATE kamcli_marks SET mark_value=:value WHERE mark_name=:name"
+        ),
+        {"name": name, "value": value},
+    )
+    if res.rowcount == 0:
+        c.execute(
+            text(
+                "INSERT INTO kamcli_marks (mark_name, mark_value)"
+                " VALUES (:name, :value)"
+            ),
+            {"name": name, "value": value},
+        )
+
+
+def acc_mark_table_exists(e):
+    """Return True if kamcli_marks table exists in the database"""
+    from sqlalchemy import inspect
+
+    return inspect(e).has_table("kamcli_marks")
+
+
+def acc_cdrs_generate_open(ctx, e, chunksize, markid, maxcall=24):
+    """Generate the cdrs for the open calls before the high-water mark
+
+    \b
+    The answered INVITE records with id not greater than markid, not linked
+    to a cdr and not older than maxcall hours are the calls that were still
+    waiting for the BYE on previous runs. They are paired again in chunks,
+    each chunk in its own transaction. Returns the number of inserted cdrs.
+    """
+    from sqlalchemy.sql import text
+
+    qinvites = text(
+        "SELECT id, src_user, src_domain, dst_user, dst_domain, dst_ouser,"
+        " time, callid, from_tag, to_tag, src_ip, sip_code FROM acc"
+        " WHERE method='INVITE' AND cdr_id=0 AND id > :lastid"
+        " AND id <= :markid AND sip_code LIKE :answered AND time > :oldest"
+        " ORDER BY id LIMIT {0}".format(int(chunksize))
+    )
+    oldest = datetime.datetime.now() - datetime.timedelta(hours=maxcall)
+    lastid = 0
+    ncdrs = 0
+    while True:
+        with e.connect() as c:
+            with c.begin():
+                invites = c.execute(
+                    qinvites,
+                    {
+                        "lastid": lastid,
+                        "markid": markid,
+                        "answered": "2%",
+                        "oldest": oldest.strftime("%Y-%m-%d %H:%M:%S"),
+                    },
+                ).fetchall()
+                if not invites:
+                    break
+                n, unpaired = acc_cdrs_generate_chunk(ctx, c, invites)
+        ncdrs += n
+        lastid = invites[-1]["id"]
+        ctx.vlog(
+            "processed open calls up to id {0} - generated cdrs: {1}".format(
+                lastid, ncdrs
+            )
+        )
+        if len(invites) < chunksize:
+            break
+    return ncdrs
+
+
+def acc_cdrs_generate_exec(
+    ctx, e, chunksize, startid, since=None, until=None, mark=None, maxcall=24
+):
+    """Generate the cdrs from INVITE records with id greater than startid
+
+    \b
+    The INVITE records not linked to a cdr are processed in chunks ordered
+    by id, each chunk in its own transaction. The since and until limits
+    are matched against the time of the INVITE records. If a mark name is
+    given, the open calls before startid are paired again first (see
+    acc_cdrs_generate_open()) and the id of the last processed INVITE
+    record is saved as high-water mark in the transaction of each chunk.
+    Returns a tuple with the number of inserted cdrs and the id of the last
+    processed INVITE record.
+    """
+    from sqlalchemy.sql import text
+
+    qinvites = (
+        "SELECT id, src_user, src_domain, dst_user, dst_domain, dst_ouser,"
+        " time, callid, from_tag, to_tag, src_ip, sip_code FROM acc"
+        " WHERE method='INVITE' AND cdr_id=0 AND id > :lastid"
+    )
+    if since is not None:
+        qinvites += " AND time >= :since"
+    if until is not None:
+        qinvites += " AND time < :until"
+    qinvites = text(qinvites + " ORDER BY id LIMIT {0}".format(int(chunksize)))
+    ncdrs = 0
+    if mark is not None and startid > 0:
+        ncdrs = acc_cdrs_generate_open(ctx, e, chunksize, startid, maxcall)
+    lastid = startid
+    while True:
+        with e.connect() as c:
+            with c.begin():
+                invites = c.execute(
+                    qinvites,
+                    {"lastid": lastid, "since": since, "until": until},
+                ).fetchall()
+                if not invites:
+                    break
+                n, unpaired = acc_cdrs_generate_chunk(ctx, c, invites)
+                ncdrs += n
+                lastid = invites[-1]["id"]
+                if mark is not None:
+                    acc_mark_set(c, mark, lastid)
+        ctx.vlog(
+            "processed INVITE records up to id {0} - generated cdrs: {1}".format(
+                lastid, ncdrs
+            )
+        )
+        if len(invites) < chunksize:
+            break
+    return ncdrs, lastid
+
+
+def acc_cdrs_count(ctx, e, startid, since=None, until=None):
+    """Return the number of INVITE records to be processed for cdrs"""
+    from sqlalchemy.sql import text
+
+    query = (
+        "SELECT COUNT(*) FROM acc"
+        " WHERE method='INVITE' AND cdr_id=0 AND id > :lastid"
+    )
+    if since is not None:
+        query += " AND time >= :since"
+    if until is not None:
+        query += " AND time < :until"
+    with e.connect() as c:
+        return c.execute(
+            text(query), {"lastid": startid, "since": since, "until": until}
+        ).scalar()
+
+
+@cli.command(
+    "cdrs-index-create",
+    short_help="Run SQL statements to create indexes for generating cdrs",
+)
+@pass_context
+def acc_cdrs_index_create(ctx):
+    """Run SQL statements to create indexes for generating cdrs
+
+    \b
+    Creates the indexes of acc table for selecting the records not linked
+    to cdrs and for the time interval, plus kamcli_marks table where the
+    high-water mark of cdrs generation is stored.
+    """
+    ctx.vlog("Run SQL statements to create indexes for generating cdrs")
+    e = ctx.dbengine()
+    sqltext = """
+      CREATE INDEX acc_cdr_idx ON acc (method, cdr_id);
+      CREATE INDEX acc_time_idx ON acc (time);
+      CREATE TABLE kamcli_marks (
+        mark_name VARCHAR(64) NOT NULL PRIMARY KEY,
+        mark_value BIGINT NOT NULL DEFAULT 0
+      );
+    """
+    dbutils_exec_sqltext(ctx, e, sqltext)
 
 
 @cli.command(
     "cdrs-generate",
-    short_help="Run SQL stored procedure to generate CDRS",
+    short_help="Generate CDRS from acc records",
+)
+@click.option(
+    "proc",
+    "--proc",
+    is_flag=True,
+    help="Run the SQL stored procedure (see cdrs-proc-create)",
+)
+@click.option(
+    "chunksize",
+    "--chunk-size",
+    "-c",
+    type=int,
+    default=1000,
+    help="Number of INVITE records per transaction (default: 1000)",
+)
+@click.option(
+    "startid",
+    "--start-id",
+    type=int,
+    default=None,
+    help="Process the INVITE records with greater id",
+)
+@click.option(
+    "since",
+    "--since",
+    type=click.DateTime(),
+    default=None,
+    help="Process the INVITE records from this time",
+)
+@click.option(
+    "until",
+    "--until",
+    type=click.DateTime(),
+    default=None,
+    help="Process the INVITE records before this time",
+)
+@click.option(
+    "mark",
+    "--mark",
+    default="cdrs",
+    help='Name of the high-water mark (default: "cdrs")',
+)
+@click.option(
+    "nomark",
+    "--no-mark",
+    is_flag=True,
+    help="Do not use the high-water mark",
+)
+@click.option(
+    "maxcall",
+    "--max-call",
+    type=int,
+    default=24,
+    help="Hours to wait for the BYE of a call (default: 24)",
+)
+@click.option(
+    "dryrun",
+    "--dry-run",
+    is_flag=True,
+    help="Only print the number of INVITE records to be processed",
 )
 @pass_context
-def acc_cdrs_generate(ctx):
-    """Run SQL stored procedure to generate CDRS"""
-    ctx.vlog("Run SQL stored procedure to generate CDRS")
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
-    with e.connect() as c:
-        t = c.begin()
-        c.execute("call kamailio_cdrs()")
-        t.commit()
+def acc_cdrs_generate(
+    ctx,
+    proc,
+    chunksize,
+    startid,
+    since,
+    until,
+    mark,
+    nomark,
+    maxcall,
+    dryrun,
+):
+    """Generate CDRS from acc records
+
+    \b
+    The INVITE records not linked to a cdr are paired with their BYE
+    records and the cdrs are inserted, processing chunk-size INVITE records
+    per transaction.
+    If kamcli_marks table exists (see cdrs-index-create), the processing
+    starts after the high-water mark saved by previous run, so only the new
+    acc records are scanned, plus the answered calls still waiting for the
+    BYE (not older than --max-call hours). The mark is not used when
+    --start-id, --since or --until are given, to process a specific range
+    of records.
+    With --proc, the SQL stored procedure is run in one transaction instead
+    (only MySQL).
+    """
+    e = ctx.dbengine()
+    if proc:
+        ctx.vlog("Run SQL stored procedure to generate CDRS")
+        with e.connect() as c:
+            t = c.begin()
+            c.execute("call kamailio_cdrs()")
+            t.commit()
+        return
+    if chunksize < 1:
+        ctx.log("invalid chunk size: " + str(chunksize))
+        sys.exit()
+    if nomark or startid is not None or since is not None or until is not None:
+        mark = None
+    elif not acc_mark_table_exists(e):
+        ctx.vlog("table kamcli_marks not found - high-water mark not used")
+        mark = None
+    if startid is None:
+        startid = 0
+        if mark is not None:
+            with e.connect() as c:
+                startid = acc_mark_get(c, mark) or 0
+            ctx.vlog("high-water mark [{0}]: {1}".format(mark, startid))
+    if dryrun:
+        ctx.printf(
+            "INVITE records to process: {0}".format(
+                acc_cdrs_count(ctx, e, startid, since, until)
+            )
+        )
+        return
+    ctx.vlog("Generate CDRS from acc records")
+    ncdrs, lastid = acc_cdrs_generate_exec(
+        ctx, e, chunksize, startid, since, until, mark, maxcall
+    )
+    ctx.vlog(
+        "generated cdrs: {0} - last processed INVITE id: {1}".format(
+            ncdrs, lastid
+        )
+    )
 
 
 @cli.command(
@@ -351,7 +888,7 @@ def acc_cdrs_generate(ctx):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -370,23 +907,48 @@ def acc_cdrs_generate(ctx):
     default=20,
     help="The limit of listed records (default: 20)",
 )
+@click.option(
+    "afterid",
+    "--after-id",
+    type=int,
+    default=None,
+    help="List the records with greater id (ascending order)",
+)
+@click.option(
+    "beforeid",
+    "--before-id",
+    type=int,
+    default=None,
+    help="List the records with lower id",
+)
+@click.option(
+    "interactive",
+    "--interactive",
+    "-I",
+    is_flag=True,
+    help="Ask to list the next page of limit records",
+)
 @pass_context
-def acc_cdrs_list(ctx, oformat, ostyle, limit):
+def acc_cdrs_list(ctx, oformat, ostyle, limit, afterid, beforeid, interactive):
     """List call data records
 
     \b
+    The records are listed by cdr_id, newest first, or oldest first after
+    the id given with --after-id. With --interactive, the next page of
+    records is listed on confirmation.
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
     ctx.vlog("Showing call data records")
-    query = ""
-    if limit <= 0:
-        query = "select * from cdrs order by cdr_id desc"
-    else:
-        query = "select * from cdrs order by cdr_id desc limit {0}".format(
-            limit
-        )
-    res = e.execute(query)
-    ioutils_dbres_print(ctx, oformat, ostyle, res)
+    acc_list_records(
+        ctx,
+        oformat,
+        ostyle,
+        "cdrs",
+        "cdr_id",
+        limit,
+        afterid,
+        beforeid,
+        interactive,
+    )
 
 
 @cli.command("rates-add", short_help="Add a new rating record to database")
@@ -417,7 +979,7 @@ def acc_rates_add(ctx, dbtname, rate_group, prefix, rate_unit, time_unit):
         rate_group,
         prefix,
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     v_dbtname = dbtname.encode("ascii", "ignore").decode()
     v_rate_group = rate_group.encode("ascii", "ignore").decode()
     v_prefix = prefix.encode("ascii", "ignore").decode()
@@ -453,7 +1015,7 @@ def acc_rates_rm(ctx, dbtname, rate_group, prefix):
         rate_group,
         prefix,
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     v_dbtname = dbtname.encode("ascii", "ignore").decode()
     v_rate_group = rate_group.encode("ascii", "ignore").decode()
     v_prefix = prefix.encode("ascii", "ignore").decode()
@@ -474,7 +1036,7 @@ def acc_rates_rm(ctx, dbtname, rate_group, prefix):
 def acc_rates_proc_create(ctx):
     """Run SQL statements to create the stored procedure to rate cdrs"""
     ctx.vlog("Run SQL statements to create the stored procedure to rate cdrs")
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     sqltext = """
         CREATE PROCEDURE `kamailio_rating`(`rgroup` varchar(64))
         BEGIN
@@ -506,31 +1068,165 @@ def acc_rates_proc_create(ctx):
     e.execute(sqltext)
 
 
+def acc_rates_load(ctx, e, dbtname, rate_group):
+    """Load the rates of a group as a dictionary prefix: (rate_unit, time_unit)
+
+    \b
+    Returns also the length of the longest prefix. The rates with invalid
+    time unit are skipped.
+    """
+    from sqlalchemy.sql import text
+
+    rates = {}
+    with e.connect() as c:
+        res = c.execute(
+            text(
+                "SELECT prefix, rate_unit, time_unit FROM {0}"
+                " WHERE rate_group=:rate_group".format(dbtname)
+            ),
+            {"rate_group": rate_group},
+        )
+        for row in res:
+            if row["time_unit"] <= 0:
+                ctx.log(
+                    "invalid time unit for prefix [{0}] in rate group [{1}]".format(
+                        row["prefix"], rate_group
+                    )
+                )
+                continue
+            rates[row["prefix"]] = (row["rate_unit"], row["time_unit"])
+    return rates, max((len(p) for p in rates), default=0)
+
+
+def acc_rates_generate_exec(ctx, e, dbtname, rate_group, chunksize):
+    """Rate the cdrs not rated yet with the rates of a group
+
+    \b
+    The rates are loaded once, then the cdrs are fetched in chunks ordered
+    by cdr_id. For each cdr, the rate with the longest prefix matching the
+    destination username is selected by dictionary lookups and the cost is
+    computed as rate_unit * ceil(duration / time_unit). The costs of each
+    chunk are updated with one executemany, in its own transaction.
+    Returns the number of rated cdrs.
+    """
+    from sqlalchemy.sql import text
+
+    rates, maxlen = acc_rates_load(ctx, e, dbtname, rate_group)
+    if not rates:
+        ctx.vlog("no rates for group: " + rate_group)
+        return 0
+    qcdrs = text(
+        "SELECT cdr_id, dst_username, duration FROM cdrs"
+        " WHERE rated=0 AND cdr_id > :lastid"
+        " ORDER BY cdr_id LIMIT {0}".format(int(chunksize))
+    )
+    qupdate = text("UPDATE cdrs SET rated=1, cost=:cost WHERE cdr_id=:cdr_id")
+    lastid = 0
+    nrated = 0
+    while True:
+        with e.connect() as c:
+            with c.begin():
+                cdrs = c.execute(qcdrs, {"lastid": lastid}).fetchall()
+                if not cdrs:
+                    break
+                costs = []
+                for cdr in cdrs:
+                    dst = cdr["dst_username"]
+                    for n in range(min(len(dst), maxlen), -1, -1):
+                        rate = rates.get(dst[:n])
+                        if rate is not None:
+                            break
+                    else:
+                        continue
+                    costs.append(
+                        {
+                            "cdr_id": cdr["cdr_id"],
+                            "cost": rate[0] * -(-cdr["duration"] // rate[1]),
+                        }
+                    )
+                if costs:
+                    c.execute(qupdate, costs)
+        lastid = cdrs[-1]["cdr_id"]
+        nrated += len(costs)
+        ctx.vlog(
+            "processed cdrs up to id {0} - rated cdrs: {1}".format(
+                lastid, nrated
+            )
+        )
+        if len(cdrs) < chunksize:
+            break
+    return nrated
+
+
 @cli.command(
     "rates-generate",
-    short_help="Run SQL stored procedure to rate the CDRS and generate the costs",
+    short_help="Rate the CDRS and generate the costs",
+)
+@click.option(
+    "proc",
+    "--proc",
+    is_flag=True,
+    help="Run the SQL stored procedure (see rates-proc-create)",
+)
+@click.option(
+    "dbtname",
+    "--dbtname",
+    default="billing_rates",
+    help='The name of the database table (default: "billing_rates")',
+)
+@click.option(
+    "chunksize",
+    "--chunk-size",
+    "-c",
+    type=int,
+    default=1000,
+    help="Number of cdrs per transaction (default: 1000)",
 )
 @click.argument("rate_group", nargs=-1, metavar="[<rate_group>]")
 @pass_context
-def acc_rates_generate(ctx, rate_group):
-    """Run SQL stored procedure to rate the CDRS and generate the costs
+def acc_rates_generate(ctx, proc, dbtname, chunksize, rate_group):
+    """Rate the CDRS and generate the costs
 
     \b
     Parameters:
-        <rate_group> - name of rating group
+        <rate_group> - name of rating group (default: "default")
+    The rates of the group are loaded once and the cdrs not rated yet are
+    rated in chunks, selecting the rate with the longest prefix matching
+    the destination username. With many groups, they are used in the given
+    order. With --proc, the SQL stored procedure is run in one transaction
+    instead (only MySQL).
     """
-    ctx.vlog(
-        "Run SQL stored procedure to rate the CDRS and generate the costs"
-    )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
-    with e.connect() as c:
-        t = c.begin()
-        if not rate_group:
-            c.execute('call kamailio_rating("default")')
-        else:
-            for rg in rate_group:
-                c.execute("call kamailio_rating({0!r})".format(rg))
-        t.commit()
+    e = ctx.dbengine()
+    if proc:
+        ctx.vlog(
+            "Run SQL stored procedure to rate the CDRS and generate the costs"
+        )
+        with e.connect() as c:
+            t = c.begin()
+            if not rate_group:
+                c.execute('call kamailio_rating("default")')
+            else:
+                for rg in rate_group:
+                    c.execute("call kamailio_rating({0!r})".format(rg))
+            t.commit()
+        return
+    if chunksize < 1:
+        ctx.log("invalid chunk size: " + str(chunksize))
+        sys.exit()
+    if not rate_group:
+        rate_group = ["default"]
+    for rg in rate_group:
+        ctx.vlog("Rate the CDRS with group: " + rg)
+        nrated = acc_rates_generate_exec(ctx, e, dbtname, rg, chunksize)
+        ctx.vlog("rated cdrs with group [{0}]: {1}".format(rg, nrated))
+
+
+def acc_files_since(interval):
+    """Return the start time of the interval for export files (str)"""
+    if interval <= 0:
+        return None
+    since = datetime.datetime.now() - datetime.timedelta(hours=interval)
+    return since.strftime("%Y-%m-%d %H:%M:%S")
 
 
 @cli.command(
@@ -541,7 +1237,7 @@ def acc_rates_generate(ctx, rate_group):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -568,9 +1264,16 @@ def acc_rates_generate(ctx, rate_group):
     default=24,
     help="The time interval in hours (default: 24)",
 )
+@click.option(
+    "files",
+    "--file",
+    "-f",
+    multiple=True,
+    help="Use the records exported to file instead of database",
+)
 @click.argument("name", metavar="<name>")
 @pass_context
-def acc_report(ctx, oformat, ostyle, limit, interval, name):
+def acc_report(ctx, oformat, ostyle, limit, interval, files, name):
     """Show various accounting reports
 
     \b
@@ -580,8 +1283,9 @@ def acc_report(ctx, oformat, ostyle, limit, interval, name):
             - top-dst: most active callees
             - top-odst: most active original callees
             - top-srcip: most active source IP addresses
+    The report can be done on files created with export command, given
+    with --file options, instead of database.
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
     ctx.vlog("Showing accounting report: " + name)
 
     qfield = "src_user"
@@ -592,17 +1296,30 @@ def acc_report(ctx, oformat, ostyle, limit, interval, name):
     elif name == "top-srcip":
         qfield = "src_ip"
 
-    query = "SELECT `" + qfield + "`, count(*) AS `count` FROM acc"
+    if files:
+        counts = ioexport_group_count(
+            ctx, files, [qfield], since=acc_files_since(interval)
+        )
+        rows = sorted(
+            ((k[0], n) for k, n in counts.items()),
+            key=lambda r: r[1],
+            reverse=True,
+        )
+        if limit > 0:
+            rows = rows[:limit]
+        res = IOUtilsRows([qfield, "count"], rows)
+        ioutils_dbres_print(ctx, oformat, ostyle, res)
+        return
+
+    e = ctx.dbroengine()
+    query = "SELECT " + qfield + ", COUNT(*) AS count FROM acc"
 
     if interval > 0:
-        query = (
-            query
-            + " WHERE DATE_SUB(NOW(), INTERVAL {0} HOUR) <= time".format(
-                interval
-            )
+        query = query + " WHERE {0} <= time".format(
+            dbutils_sql_hours_ago(e, interval)
         )
 
-    query = query + " GROUP BY `" + qfield + "` ORDER BY count DESC"
+    query = query + " GROUP BY " + qfield + " ORDER BY count DESC"
 
     if limit > 0:
         query = query + " LIMIT {0}".format(limit)
@@ -611,6 +1328,67 @@ def acc_report(ctx, oformat, ostyle, limit, interval, name):
     ioutils_dbres_print(ctx, oformat, ostyle, res)
 
 
+def acc_code_buckets(ctx, buckets):
+    """Parse the specs of SIP code buckets
+
+    \b
+    Each spec is like [name=]item[,item...], the item being a code (486),
+    a range of codes (480-489) or a class of codes (4xx). The name is the
+    spec itself if not given. Returns a list of (name, [(min, max), ...]).
+    """
+    lbuckets = []
+    for spec in buckets:
+        name, sep, items = spec.partition("=")
+        if not sep:
+            items = spec
+        ranges = []
+        for item in items.split(","):
+            item = item.strip().lower()
+            try:
+                if len(item) == 3 and item.endswith("xx"):
+                    code = int(item[0]) * 100
+                    ranges.append((code, code + 99))
+                elif "-" in item:
+                    cmin, cmax = item.split("-", 1)
+                    ranges.append((int(cmin), int(cmax)))
+                else:
+                    ranges.append((int(item), int(item)))
+            except ValueError:
+                ctx.log("invalid code bucket: " + spec)
+                sys.exit()
+        lbuckets.append((name, ranges))
+    return lbuckets
+
+
+def acc_method_stats_query(ctx, limit, interval):
+    """Return the counts of acc records by method and SIP code"""
+    e = ctx.dbroengine()
+
+    qfrom = "acc"
+    qwhere = ""
+
+    if interval > 0:
+        qwhere = " WHERE {0} <= time".format(
+            dbutils_sql_hours_ago(e, interval)
+        )
+
+    if limit > 0:
+        # count only the first limit records
+        qfrom = "(SELECT method, sip_code FROM acc{0} LIMIT {1}) accl".format(
+            qwhere, limit
+        )
+        qwhere = ""
+
+    query = (
+        "SELECT method, sip_code, COUNT(*) AS count FROM "
+        + qfrom
+        + qwhere
+        + " GROUP BY method, sip_code"
+    )
+
+    return e.execute(query)
+
+
 @cli.command(
     "method-stats",
     short_help="Show method statistics",
@@ -619,7 +1397,7 @@ def acc_report(ctx, oformat, ostyle, limit, interval, name):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -646,29 +1424,52 @@ def acc_report(ctx, oformat, ostyle, limit, interval, name):
     default=24,
     help="The time interval in hours (default: 24)",
 )
+@click.option(
+    "buckets",
+    "--bucket",
+    "-b",
+    multiple=True,
+    help="Count INVITEs with SIP codes in bucket (e.g., 4xx, busy=486,600)",
+)
+@click.option(
+    "files",
+    "--file",
+    "-f",
+    multiple=True,
+    help="Use the records exported to file instead of database",
+)
 @pass_context
-def acc_method_stats(ctx, oformat, ostyle, limit, interval):
+def acc_method_stats(ctx, oformat, ostyle, limit, interval, buckets, files):
     """Show method statistics
 
     \b
+    The records are counted by method and SIP code in the database, only
+    the counters are transferred. The INVITE records can be also counted
+    in custom buckets of SIP codes, given with --bucket options:
+        - a code: 486
+        - a range of codes: 480-489
+        - a class of codes: 4xx
+        - a named list of the above: busy=486,600
+    The statistics can be done on files created with export command, given
+    with --file options, instead of database.
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
     ctx.vlog("Showing method statistics")
-
-    query = "SELECT method, sip_code, time, UNIX_TIMESTAMP(time) as tstamp FROM acc"
-
-    if interval > 0:
-        query = (
-            query
-            + " WHERE DATE_SUB(NOW(), INTERVAL {0} HOUR) <= time".format(
-                interval
-            )
+    lbuckets = acc_code_buckets(ctx, buckets)
+
+    if files:
+        counts = ioexport_group_count(
+            ctx,
+            files,
+            ["method", "sip_code"],
+            since=acc_files_since(interval),
+            limit=limit,
         )
-
-    if limit > 0:
-        query = query + " LIMIT {0}".format(limit)
-
-    res = e.execute(query)
+        res = IOUtilsRows(
+            ["method", "sip_code", "count"],
+            ((k[0], k[1], n) for k, n in counts.items()),
+        )
+    else:
+        res = acc_method_stats_query(ctx, limit, interval)
 
     acc_records = {}
     acc_records["invite"] = 0
@@ -679,23 +1480,519 @@ def acc_method_stats(ctx, oformat, ostyle, limit, interval):
     acc_records["invite404"] = 0
     acc_records["invite487"] = 0
     acc_records["inviteXYZ"] = 0
+    for name, ranges in lbuckets:
+        if "invite" + name in acc_records:
+            ctx.log("code bucket name already in use: " + name)
+            sys.exit()
+        acc_records["invite" + name] = 0
 
     for row in res:
+        count = int(row["count"])
         if row["method"] == "INVITE":
-            acc_records["invite"] += 1
+            acc_records["invite"] += count
             if row["sip_code"] == "200":
-                acc_records["invite200"] += 1
+                acc_records["invite200"] += count
             elif row["sip_code"] == "404":
-                acc_records["invite404"] += 1
+                acc_records["invite404"] += count
             elif row["sip_code"] == "487":
-                acc_records["invite487"] += 1
+                acc_records["invite487"] += count
             else:
-                acc_records["inviteXYZ"] += 1
+                acc_records["inviteXYZ"] += count
+            try:
+                code = int(row["sip_code"])
+            except (TypeError, ValueError):
+                continue
+            for name, ranges in lbuckets:
+                for cmin, cmax in ranges:
+                    if cmin <= code <= cmax:
+                        acc_records["invite" + name] += count
+                        break
         elif row["method"] == "BYE":
-            acc_records["bye"] += 1
+            acc_records["bye"] += count
         elif row["method"] == "MESSAGE":
-            acc_records["message"] += 1
+            acc_records["message"] += count
         else:
-            acc_records["other"] += 1
+            acc_records["other"] += count
 
     ioutils_dict_print(ctx, oformat, ostyle, acc_records)
+
+
+@cli.command(
+    "time-stats",
+    short_help="Show time series of call statistics",
+)
+@click.option(
+    "oformat",
+    "--output-format",
+    "-F",
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
+    default=None,
+    help="Format the output",
+)
+@click.option(
+    "ostyle",
+    "--output-style",
+    "-S",
+    default=None,
+    help="Style of the output (tabulate table format)",
+)
+@click.option(
+    "granularity",
+    "--granularity",
+    "-g",
+    type=click.Choice(list(DBUTILS_TIME_BUCKETS.keys())),
+    default="hour",
+    help="The time interval of the buckets (default: hour)",
+)
+@click.option(
+    "interval",
+    "--interval",
+    "-i",
+    type=int,
+    default=24,
+    help="The time interval in hours (default: 24)",
+)
+@click.option(
+    "codes",
+    "--code",
+    "-c",
+    multiple=True,
+    help="SIP code to be counted per bucket (default: 200, 404, 486, 487)",
+)
+@click.option(
+    "files",
+    "--file",
+    "-f",
+    multiple=True,
+    help="Use the records exported to file instead of database",
+)
+@pass_context
+def acc_time_stats(ctx, oformat, ostyle, granularity, interval, codes, files):
+    """Show time series of call statistics
+
+    \b
+    The INVITE records are counted in the database per time bucket:
+        - bucket: the start time of the bucket
+        - attempts: number of call attempts
+        - answered: number of calls answered with 2xx
+        - asr: answer seizure ratio (percent)
+        - cNNN: number of calls with SIP code NNN (see --code option)
+    The statistics can be done on files created with export command, given
+    with --file options, instead of database.
+    """
+    ctx.vlog("Showing time series of call statistics")
+    if not codes:
+        codes = ["200", "404", "486", "487"]
+    for code in codes:
+        if len(code) != 3 or not code.isdigit():
+            ctx.log("invalid SIP code: " + code)
+            sys.exit()
+
+    if files:
+        counts = ioexport_group_count(
+            ctx,
+            files,
+            ["bucket", "sip_code"],
+            since=acc_files_since(interval),
+            where={"method": "INVITE"},
+            bucket=granularity,
+        )
+        tbuckets = {}
+        for k, n in counts.items():
+            tbuckets.setdefault(k[0], {})[k[1]] = n
+        rows = []
+        for tb in sorted(tbuckets):
+            bcounts = tbuckets[tb]
+            attempts = sum(bcounts.values())
+            answered = sum(n for c, n in bcounts.items() if "200" <= c < "300")
+            rows.append(
+                [tb, attempts, answered, round(100.0 * answered / attempts, 2)]
+                + [bcounts.get(c, 0) for c in codes]
+            )
+        res = IOUtilsRows(
+            ["bucket", "attempts", "answered", "asr"]
+            + ["c" + c for c in codes],
+            rows,
+        )
+        ioutils_dbres_print(ctx, oformat, ostyle, res)
+        return
+
+    e = ctx.dbroengine()
+    qanswered = "SUM(CASE WHEN sip_code >= '200' AND sip_code < '300'"
+    qanswered += " THEN 1 ELSE 0 END)"
+    query = "SELECT {0} AS bucket, COUNT(*) AS attempts".format(
+        dbutils_sql_time_bucket(e, "time", granularity)
+    )
+    query += ", {0} AS answered".format(qanswered)
+    query += ", ROUND(100.0 * {0} / COUNT(*), 2) AS asr".format(qanswered)
+    for code in codes:
+        query += (
+            ", SUM(CASE WHEN sip_code = '{0}' THEN 1 ELSE 0 END)"
+            " AS c{0}".format(code)
+        )
+    query += " FROM acc WHERE method = 'INVITE'"
+
+    if interval > 0:
+        query += " AND {0} <= time".format(dbutils_sql_hours_ago(e, interval))
+
+    query += " GROUP BY 1 ORDER BY 1"
+
+    res = e.execute(query)
+    ioutils_dbres_print(ctx, oformat, ostyle, res)
+
+
+def acc_archive_exec(
+    ctx,
+    e,
+    table,
+    cutoff,
+    chunksize,
+    rate,
+    ostream=None,
+    oformat="ndjson",
+    header=False,
+    progress=False,
+):
+    """Move the records older than cutoff out of the table in chunks
+
+    \b
+    Each chunk of records (ordered by id) is written to ostream (if not
+    None) and then deleted in its own short transaction. The rate limits
+    the number of records processed per second (0 - no limit). If header
+    is True, the names of the columns are written first (csv format). If
+    progress is True, the counter of archived records is updated on
+    stderr. Returns the number of archived records.
+    """
+    from sqlalchemy.sql import text
+    from sqlalchemy.sql import bindparam
+
+    qselect = text(
+        "SELECT * FROM {0} WHERE id > :lastid AND time < :cutoff"
+        " ORDER BY id LIMIT {1}".format(table, int(chunksize))
+    )
+    qdelete = text(
+        "DELETE FROM {0} WHERE id IN :ids".format(table)
+    ).bindparams(bindparam("ids", expanding=True))
+    lastid = 0
+    nrows = 0
+    tstart = time.time()
+    while True:
+        with e.connect() as c:
+            with c.begin():
+                rows = c.execute(
+                    qselect, {"lastid": lastid, "cutoff": cutoff}
+                ).fetchall()
+                if not rows:
+                    break
+                if ostream is not None:
+                    if header and nrows == 0:
+                        ioutils_dbrows_write(
+                            ostream, oformat, [rows[0].keys()]
+                        )
+                    ioutils_dbrows_write(ostream, oformat, rows)
+                    # records must be in the file before being deleted
+                    ostream.flush()
+                c.execute(qdelete, {"ids": [r["id"] for r in rows]})
+        lastid = rows[-1]["id"]
+        nrows += len(rows)
+        ctx.vlog(
+            "archived records from {0}: {1} (last id: {2})".format(
+                table, nrows, lastid
+            )
+        )
+        if progress:
+            click.echo(
+                "\rarchived records from {0}: {1}".format(table, nrows),
+                nl=False,
+                err=True,
+            )
+        if len(rows) < chunksize:
+            break
+        if rate > 0:
+            twait = tstart + nrows / rate - time.time()
+            if twait > 0:
+                time.sleep(twait)
+    if progress and nrows > 0:
+        click.echo(err=True)
+    return nrows
+
+
+@cli.command(
+    "archive",
+    short_help="Archive and remove old accounting records",
+)
+@click.option(
+    "table",
+    "--table",
+    "-t",
+    type=click.Choice(["acc", "missed_calls"]),
+    default="acc",
+    help="The table with the records (default: acc)",
+)
+@click.option(
+    "days",
+    "--days",
+    "-d",
+    type=int,
+    default=None,
+    help="Archive the records older than the number of days",
+)
+@click.option(
+    "before",
+    "--before",
+    type=click.DateTime(),
+    default=None,
+    help="Archive the records older than this time",
+)
+@click.option(
+    "ofile",
+    "--output",
+    "-o",
+    default=None,
+    help="Write the records to file (compressed if .gz, .bz2 or .xz)",
+)
+@click.option(
+    "oformat",
+    "--output-format",
+    "-F",
+    type=click.Choice(["ndjson", "csv"]),
+    default=None,
+    help="Format of the output file (default: from file name or ndjson)",
+)
+@click.option(
+    "chunksize",
+    "--chunk-size",
+    "-c",
+    type=int,
+    default=1000,
+    help="Number of records per transaction (default: 1000)",
+)
+@click.option(
+    "rate",
+    "--rate",
+    "-r",
+    type=float,
+    default=0,
+    help="Max number of records archived per second (default: 0 - no limit)",
+)
+@click.option(
+    "progress",
+    "--progress",
+    "-p",
+    is_flag=True,
+    help="Show the counter of archived records",
+)
+@click.option(
+    "dryrun",
+    "--dry-run",
+    is_flag=True,
+    help="Only print the number of records to be archived",
+)
+@pass_context
+def acc_archive(
+    ctx,
+    table,
+    days,
+    before,
+    ofile,
+    oformat,
+    chunksize,
+    rate,
+    progress,
+    dryrun,
+):
+    """Archive and remove old accounting records
+
+    \b
+    The records older than the cutoff time (--days or --before) are
+    deleted in chunks of records ordered by id, each chunk in its own short
+    transaction, so the inserts done by Kamailio are not blocked. With
+    --output, the records are appended to the file before being deleted
+    (a record may be written twice if its chunk failed to be deleted).
+    An interrupted run can be resumed by running the command again.
+    """
+    from sqlalchemy.sql import text
+
+    if before is None:
+        if days is None:
+            ctx.log("the cutoff time is not set (--days or --before)")
+            sys.exit()
+        before = datetime.datetime.now() - datetime.timedelta(days=days)
+        before = before.replace(microsecond=0)
+    if chunksize < 1:
+        ctx.log("invalid chunk size: " + str(chunksize))
+        sys.exit()
+    e = ctx.dbengine()
+    if dryrun:
+        with e.connect() as c:
+            nrows = c.execute(
+                text(
+                    "SELECT COUNT(*) FROM {0} WHERE time < :cutoff".format(
+                        table
+                    )
+                ),
+                {"cutoff": before},
+            ).scalar()
+        ctx.printf("records to archive from {0}: {1}".format(table, nrows))
+        return
+    ostream = None
+    header = False
+    if ofile is not None:
+        if oformat is None:
+            oformat = "ndjson"
+            if "csv" in os.path.basename(ofile).split(".")[1:]:
+                oformat = "csv"
+        header = oformat == "csv" and (
+            not os.path.exists(ofile) or os.path.getsize(ofile) == 0
+        )
+        ostream = ioutils_file_open(ofile, "at")
+    ctx.vlog(
+        "Archive records from {0} older than {1}".format(table, str(before))
+    )
+    try:
+        nrows = acc_archive_exec(
+            ctx,
+            e,
+            table,
+            before,
+            chunksize,
+            rate,
+            ostream,
+            oformat,
+            header,
+            progress,
+        )
+    finally:
+        if ostream is not None:
+            ostream.close()
+    ctx.printf("archived records from {0}: {1}".format(table, nrows))
+
+
+##
+# time and id columns of the exported tables
+ACC_EXPORT_TABLES = {
+    "acc": ("time", "id"),
+    "missed_calls": ("time", "id"),
+    "cdrs": ("call_start_time", "cdr_id"),
+}
+
+
+@cli.command(
+    "export",
+    short_help="Export accounting records to file for offline reports",
+)
+@click.option(
+    "table",
+    "--table",
+    "-t",
+    type=click.Choice(list(ACC_EXPORT_TABLES.keys())),
+    default="acc",
+    help="The table with the records (default: acc)",
+)
+@click.option(
+    "oformat",
+    "--output-format",
+    "-F",
+    type=click.Choice(["parquet", "csv"]),
+    default=None,
+    help="Format of the file (default: parquet for .parquet files, or csv)",
+)
+@click.option(
+    "since",
+    "--since",
+    type=click.DateTime(),
+    default=None,
+    help="Export the records from this time",
+)
+@click.option(
+    "until",
+    "--until",
+    type=click.DateTime(),
+    default=None,
+    help="Export the records before this time",
+)
+@click.option(
+    "afterid",
+    "--after-id",
+    type=int,
+    default=0,
+    help="Export the records with greater id (default: 0)",
+)
+@click.option(
+    "chunksize",
+    "--chunk-size",
+    "-c",
+    type=int,
+    default=10000,
+    help="Number of records fetched per query (default: 10000)",
+)
+@click.argument("ofile", metavar="<file>")
+@pass_context
+def acc_export(ctx, table, oformat, since, until, afterid, chunksize, ofile):
+    """Export accounting records to file for offline reports
+
+    \b
+    Parameters:
+        <file> - the output file (e.g., acc-2026-10.parquet, acc.csv.gz)
+    The records are fetched in chunks ordered by id (keyset pagination)
+    and written as they come, to a parquet file (needs pyarrow) or to a
+    csv file, compressed if the name ends in .gz, .bz2 or .xz. The number
+    of records and min/max values of time and id are written in the
+    metadata file <file>.meta.json. The exported acc records can be used
+    with --file option of report, method-stats and time-stats commands.
+    """
+    from sqlalchemy.sql import text
+
+    if oformat is None:
+        oformat = "parquet" if ofile.endswith(".parquet") else "csv"
+    if oformat == "parquet" and ioexport_parquet_format is False:
+        ctx.log("Package pyarrow is not installed")
+        sys.exit()
+    if chunksize < 1:
+        ctx.log("invalid chunk size: " + str(chunksize))
+        sys.exit()
+    tcolumn, idcolumn = ACC_EXPORT_TABLES[table]
+    query = "SELECT * FROM {0} WHERE {1} > :lastid".format(table, idcolumn)
+    if since is not None:
+        query += " AND {0} >= :since".format(tcolumn)
+    if until is not None:
+        query += " AND {0} < :until".format(tcolumn)
+    query = text(
+        query + " ORDER BY {0} LIMIT {1}".format(idcolumn, int(chunksize))
+    )
+    ctx.vlog("Export records from {0} to {1}".format(table, ofile))
+    e = ctx.dbroengine()
+    atypes = None
+    if oformat == "parquet":
+        atypes = ioexport_arrow_types(e, table)
+    writer = IOExportWriter(ofile, oformat, table, tcolumn, idcolumn, atypes)
+    lastid = afterid
+    try:
+        while True:
+            with e.connect() as c:
+                rows = c.execute(
+                    query, {"lastid": lastid, "since": since, "until": until}
+                ).fetchall()
+            if not rows:
+                break
+            try:
+                writer.write(rows)
+            except (ValueError, TypeError) as emsg:
+                writer.abort()
+                ctx.log(
+                    "failed to write records after id {0}: {1}".format(
+                        lastid, emsg
+                    )
+                )
+                sys.exit()
+            lastid = rows[-1][idcolumn]
+            ctx.vlog(
+                "exported records: {0} (last id: {1})".format(
+                    writer.nrows, lastid
+                )
+            )
+            if len(rows) < chunksize:
+                break
+    finally:
+        writer.close()
+    ctx.printf("exported records from {0}: {1}".format(table, writer.nrows))
@@ -1,5 +1,4 @@
 import click
-from sqlalchemy import create_engine
 from kamcli.ioutils import ioutils_dbres_print
 from kamcli.cli import pass_context
 from kamcli.iorpc import command_ctl
@@ -35,7 +34,7 @@ def address_add(ctx, mask, port, tag, group, address):
         <address> - IP address
     """
     ctx.vlog("Adding to group id [%d] address [%s]", group, address)
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute(
         "insert into address (grp, ip_addr, mask, port, tag) values "
         "({0}, {1!r}, {2}, {3}, {4!r})".format(
@@ -62,7 +61,7 @@ def address_rm(ctx, mask, port, group, address):
         <group> - group id
         <address> - IP address
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     addr = address.encode("ascii", "ignore").decode()
     if not mask:
         if not port:
@@ -94,7 +93,7 @@ def address_rm(ctx, mask, port, group, address):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -114,7 +113,7 @@ def address_showdb(ctx, oformat, ostyle, group):
     Parameters:
         <group> - address group
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbroengine()
     if not group:
         ctx.vlog("Showing all address records")
         res = e.execute("select * from address")
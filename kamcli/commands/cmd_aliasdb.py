@@ -1,5 +1,4 @@
 import click
-from sqlalchemy import create_engine
 from kamcli.ioutils import ioutils_dbres_print
 from kamcli.cli import pass_context
 from kamcli.cli import parse_user_spec
@@ -42,7 +41,7 @@ def aliasdb_add(ctx, table, userid, aliasid):
         adata["username"],
         adata["domain"],
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute(
         "insert into {0} (username, domain, alias_username, "
         "alias_domain) values ({1!r}, {2!r}, {3!r}, {4!r})".format(
@@ -83,7 +82,7 @@ def aliasdb_rm(ctx, table, matchalias, userid, aliasid):
     ctx.log(
         "Removing alias for record [%s@%s]", udata["username"], udata["domain"]
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     if not aliasid:
         if matchalias:
             e.execute(
@@ -118,7 +117,7 @@ def aliasdb_rm(ctx, table, matchalias, userid, aliasid):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -154,13 +153,13 @@ def aliasdb_show(ctx, oformat, ostyle, table, matchalias, userid):
     """
     if not userid:
         ctx.vlog("Showing all records")
-        e = create_engine(ctx.gconfig.get("db", "rwurl"))
+        e = ctx.dbroengine()
         res = e.execute("select * from {0}".format(table))
         ioutils_dbres_print(ctx, oformat, ostyle, res)
     else:
+        e = ctx.dbroengine()
         for u in userid:
             udata = parse_user_spec(ctx, u)
-            e = create_engine(ctx.gconfig.get("db", "rwurl"))
 
             if matchalias:
                 ctx.vlog(
@@ -111,11 +111,14 @@ def apiban_load(ctx, key, htname, expire):
     allAddresses = apiban_fetch(ctx, key)
     ctx.vlog("fetched ip addresses - array size: " + str(len(allAddresses)))
     if len(allAddresses) > 0:
+        from kamcli.iorpcasync import command_ctl_async
+
+        cmds = []
         for a in allAddresses:
-            command_ctl(ctx, "htable.seti", [htname, a, 1])
+            cmds.append(["htable.seti", [htname, a, 1]])
             if expire > 0:
-                command_ctl(ctx, "htable.setex", [htname, a, 1])
-            time.sleep(0.002)
+                cmds.append(["htable.setex", [htname, a, 1]])
+        command_ctl_async(ctx, cmds)
     else:
         ctx.log("no APIBan records")
 
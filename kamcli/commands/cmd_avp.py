@@ -1,5 +1,4 @@
 import click
-from sqlalchemy import create_engine
 from kamcli.ioutils import ioutils_dbres_print
 from kamcli.cli import pass_context
 from kamcli.cli import parse_user_spec
@@ -116,7 +115,7 @@ def avp_dbadd(
         attribute,
         value,
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     dbname = dbtname.encode("ascii", "ignore").decode()
     c_uuid = coluuid.encode("ascii", "ignore").decode()
     c_username = colusername.encode("ascii", "ignore").decode()
@@ -275,7 +274,7 @@ def avp_dbrm(
         attribute,
         value,
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     dbname = dbtname.encode("ascii", "ignore").decode()
     c_uuid = coluuid.encode("ascii", "ignore").decode()
     c_username = colusername.encode("ascii", "ignore").decode()
@@ -317,7 +316,7 @@ def avp_dbrm(
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -424,7 +423,7 @@ def avp_dbshow(
         attribute,
         value,
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbroengine()
     dbname = dbtname.encode("ascii", "ignore").decode()
     c_uuid = coluuid.encode("ascii", "ignore").decode()
     c_username = colusername.encode("ascii", "ignore").decode()
@@ -1,9 +1,6 @@
 import os
 import sys
 import click
-from sqlalchemy import create_engine
-from sqlalchemy.sql import text
-from sqlalchemy.exc import SQLAlchemyError
 from kamcli.cli import pass_context
 from kamcli.ioutils import ioutils_dbres_print
 from kamcli.ioutils import ioutils_formats_list
@@ -78,7 +75,7 @@ def cli(ctx):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -92,7 +89,7 @@ def cli(ctx):
 @click.argument("query", metavar="<query>")
 @pass_context
 def db_query(ctx, oformat, ostyle, query):
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     res = e.execute(query.encode("ascii", "ignore").decode())
     ioutils_dbres_print(ctx, oformat, ostyle, res)
 
@@ -249,7 +246,7 @@ def db_clishowg(ctx, table):
 @pass_context
 def db_show(ctx, oformat, ostyle, table):
     ctx.vlog("Content of database table [%s]", table)
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbroengine()
     res = e.execute("select * from {0}".format(table))
     ioutils_dbres_print(ctx, oformat, ostyle, res)
 
@@ -278,7 +275,7 @@ def db_showcreate(ctx, oformat, ostyle, table):
     ctx.vlog("Show create of database table [%s]", table)
     dbtype = ctx.gconfig.get("db", "type")
     if dbtype == "mysql":
-        e = create_engine(ctx.gconfig.get("db", "rwurl"))
+        e = ctx.dbroengine()
         res = e.execute("show create table {0}".format(table))
         ioutils_dbres_print(ctx, oformat, ostyle, res)
     elif dbtype == "postgresql":
@@ -311,7 +308,7 @@ def db_runfile(ctx, fname):
         <fname> - name to the file with the SQL statements
     """
     ctx.vlog("Run statements in the file [%s]", fname)
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     dbutils_exec_sqlfile(ctx, e, fname)
 
 
@@ -431,7 +428,7 @@ def db_create_sql_table_groups(ctx, e, ldirectory, alltables):
 
 
 def db_create_mysql(ctx, ldbname, ldirectory, nousers, nogrants, alltables):
-    e = create_engine(ctx.gconfig.get("db", "adminurl"))
+    e = ctx.dbengine("adminurl")
     e.execute("create database {0}".format(ldbname))
     db_create_mysql_users(ctx, e, ldbname, nousers, nogrants)
     e.execute("use {0}".format(ldbname))
@@ -450,7 +447,7 @@ def db_create_postgresql(
         ldbname,
     )
     os.system(scmd)
-    e = create_engine(ctx.gconfig.get("db", "adminurl"))
+    e = ctx.dbengine("adminurl")
     if not nogrants:
         e.execute(
             "CREATE USER {0} WITH PASSWORD '{1}';".format(
@@ -478,8 +475,8 @@ def db_create_postgresql(
                 )
             )
     e.dispose()
-    e = create_engine(
-        "{0}+{1}://{2}:{3}@{4}/{5}".format(
+    e = ctx.dbengine(
+        url="{0}+{1}://{2}:{3}@{4}/{5}".format(
             ctx.gconfig.get("db", "type"),
             ctx.gconfig.get("db", "driver"),
             ctx.gconfig.get("db", "rwuser"),
@@ -497,7 +494,7 @@ def db_create_postgresql(
         )
     db_create_sql_table_groups(ctx, e, ldirectory, alltables)
     e.dispose()
-    e = create_engine(ctx.gconfig.get("db", "adminurl"))
+    e = ctx.dbengine("adminurl")
     if not nogrants:
         e.execute(
             "GRANT ALL PRIVILEGES ON DATABASE {0} TO {1};".format(
@@ -515,8 +512,8 @@ def db_create_postgresql(
 
 
 def db_create_sqlite(ctx, ldbname, ldirectory, alltables):
-    e = create_engine(
-        "{0}+{1}:///{2}".format(
+    e = ctx.dbengine(
+        url="{0}+{1}:///{2}".format(
             ctx.gconfig.get("db", "type"),
             ctx.gconfig.get("db", "driver"),
             ldbname,
@@ -629,7 +626,7 @@ def db_create_dbonly(ctx, dbname):
         ldbname = dbname
 
     if dbtype == "mysql":
-        e = create_engine(ctx.gconfig.get("db", "adminurl"))
+        e = ctx.dbengine("adminurl")
         e.execute("create database {0}".format(ldbname))
     elif dbtype == "postgresql":
         scmd = (
@@ -686,7 +683,7 @@ def db_drop(ctx, dbname, yes):
     ctx.vlog("Dropping database [%s]", ldbname)
 
     if dbtype == "mysql":
-        e = create_engine(ctx.gconfig.get("db", "adminurl"))
+        e = ctx.dbengine("adminurl")
         e.execute("drop database {0}".format(ldbname))
     elif dbtype == "postgresql":
         scmd = (
@@ -717,7 +714,7 @@ def db_create_tables_list(ctx, directory, group):
     ldirectory = ""
     if len(directory) > 0:
         ldirectory = directory
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     db_create_sql_group(ctx, e, ldirectory, group)
 
 
@@ -848,7 +845,7 @@ def db_create_tables_group(ctx, scriptsdirectory, gname):
     ldirectory = ctx.gconfig.get("db", "scriptsdirectory")
     if len(scriptsdirectory) > 0:
         ldirectory = scriptsdirectory
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     fpath = ldirectory + "/" + gname + "-create.sql"
     dbutils_exec_sqlfile(ctx, e, fpath)
 
@@ -860,7 +857,7 @@ def db_create_tables_group(ctx, scriptsdirectory, gname):
 @click.argument("oldname", metavar="<oldname>")
 @pass_context
 def db_create_table_like(ctx, newname, oldname):
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute("CREATE TABLE {0} LIKE {1}".format(newname, oldname))
 
 
@@ -886,7 +883,7 @@ def db_grant(ctx, dbname):
     if len(dbname) > 0:
         ldbname = dbname
     ctx.vlog("Creating only database [%s]", ldbname)
-    e = create_engine(ctx.gconfig.get("db", "adminurl"))
+    e = ctx.dbengine("adminurl")
     db_create_mysql_users(ctx, e, ldbname, False, False)
 
 
@@ -953,7 +950,7 @@ def db_revoke(ctx, dbname):
     if len(dbname) > 0:
         ldbname = dbname
     ctx.vlog("Revoke access to database [%s]", ldbname)
-    e = create_engine(ctx.gconfig.get("db", "adminurl"))
+    e = ctx.dbengine("adminurl")
     db_revoke_users(ctx, e, ldbname)
 
 
@@ -977,7 +974,7 @@ def db_version_set(ctx, vertable, table, version):
         <table> - Name of the table to set the version for
         <version> - Version number
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute(
         "delete from {0} where table_name={1!r}".format(
             vertable.encode("ascii", "ignore").decode(),
@@ -1006,7 +1003,7 @@ def db_version_set(ctx, vertable, table, version):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -1026,7 +1023,7 @@ def db_version_get(ctx, vertable, oformat, ostyle, table):
     Parameters:
         <table> - Name of the table to get the version for
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbroengine()
     res = e.execute(
         "select * from {0} where table_name={1!r}".format(
             vertable.encode("ascii", "ignore").decode(),
@@ -1,5 +1,4 @@
 import click
-from sqlalchemy import create_engine
 from kamcli.ioutils import ioutils_dbres_print
 from kamcli.cli import pass_context
 from kamcli.iorpc import command_ctl
@@ -20,7 +19,7 @@ def cli(ctx):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -37,7 +36,7 @@ def dialog_showdb(ctx, oformat, ostyle):
 
     \b
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbroengine()
     ctx.vlog("Showing all dialog records")
     res = e.execute("select * from dialog")
     ioutils_dbres_print(ctx, oformat, ostyle, res)
@@ -1,5 +1,4 @@
 import click
-from sqlalchemy import create_engine
 from kamcli.ioutils import ioutils_dbres_print
 from kamcli.cli import pass_context
 from kamcli.iorpc import command_ctl
@@ -71,7 +70,7 @@ def dialplan_add(
         matchop,
         matchexp,
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute(
         "insert into dialplan (dpid, pr, match_op, match_exp, match_len, "
         "subst_exp, repl_exp, attrs) values "
@@ -100,7 +99,7 @@ def dialplan_rm(ctx, dpid, matchexp):
         <dpid> - dialplan id
         [<matchexp>] - match expression
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     if not matchexp:
         e.execute("delete from dialplan where dpid={0}".format(dpid))
     else:
@@ -118,7 +117,7 @@ def dialplan_rm(ctx, dpid, matchexp):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -138,7 +137,7 @@ def dialplan_showdb(ctx, oformat, ostyle, dpid):
     Parameters:
         [<dpid>] - dialplan id
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbroengine()
     if not dpid:
         ctx.vlog("Showing all dialplan records")
         res = e.execute("select * from dialplan")
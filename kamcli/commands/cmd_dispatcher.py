@@ -1,5 +1,4 @@
 import click
-from sqlalchemy import create_engine
 from kamcli.ioutils import ioutils_dbres_print
 from kamcli.cli import pass_context
 from kamcli.iorpc import command_ctl
@@ -38,7 +37,7 @@ def dispatcher_add(
         <destination> - SIP URI for destination
     """
     ctx.vlog("Adding to setid [%d] destination [%s]", setid, destination)
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute(
         "insert into dispatcher "
         "(setid, destination, flags, priority, attrs, description) "
@@ -65,7 +64,7 @@ def dispatcher_rm(ctx, setid, destination):
         <setid> - dispatching set id
         <destination> - SIP URI for destination
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute(
         "delete from dispatcher where setid={0} and destination={1!r}".format(
             setid, destination.encode("ascii", "ignore").decode()
@@ -78,7 +77,7 @@ def dispatcher_rm(ctx, setid, destination):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -98,7 +97,7 @@ def dispatcher_showdb(ctx, oformat, ostyle, setid):
     Parameters:
         [<setid>] - dispatching set id
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbroengine()
     if not setid:
         ctx.vlog("Showing all dispatcher records")
         res = e.execute("select * from dispatcher")
@@ -1,5 +1,4 @@
 import click
-from sqlalchemy import create_engine
 from kamcli.ioutils import ioutils_dbres_print
 from kamcli.cli import pass_context
 from kamcli.iorpc import command_ctl
@@ -26,7 +25,7 @@ def domain_add(ctx, domain):
         <domain> - domain value
     """
     ctx.vlog("Adding a new domain [%s]", domain)
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute(
         "insert into domain (domain) values ({0!r})".format(
             domain.encode("ascii", "ignore").decode()
@@ -44,7 +43,7 @@ def domain_rm(ctx, domain):
     Parameters:
         <domain> - domain value
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute(
         "delete from domain where domain={0!r}".format(
             domain.encode("ascii", "ignore").decode()
@@ -60,7 +59,7 @@ def domain_rm(ctx, domain):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -80,7 +79,7 @@ def domain_showdb(ctx, oformat, ostyle, domain):
     Parameters:
         [<domain>] - domain value (optional)
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbroengine()
     if not domain:
         ctx.vlog("Showing all domain records")
         res = e.execute("select * from domain")
@@ -1,5 +1,4 @@
 import click
-from sqlalchemy import create_engine
 from kamcli.ioutils import ioutils_dbres_print
 from kamcli.cli import pass_context
 from kamcli.cli import parse_user_spec
@@ -34,7 +33,7 @@ def group_grant(ctx, userid, groupid):
         udata["domain"],
         groupid,
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute(
         "insert into grp (username, domain, grp) values ({0!r}, {1!r}, {2!r})".format(
             udata["username"], udata["domain"], groupid,
@@ -58,7 +57,7 @@ def group_revoke(ctx, userid, groupid):
     ctx.log(
         "Removing ACL for user [%s@%s]", udata["username"], udata["domain"]
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     if not groupid:
         e.execute(
             "delete from grp where username={0!r} and domain={1!r}".format(
@@ -78,7 +77,7 @@ def group_revoke(ctx, userid, groupid):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -102,7 +101,7 @@ def group_show(ctx, oformat, ostyle, userid):
     """
     if not userid:
         ctx.vlog("Showing all records")
-        e = create_engine(ctx.gconfig.get("db", "rwurl"))
+        e = ctx.dbroengine()
         res = e.execute("select * from grp")
         ioutils_dbres_print(ctx, oformat, ostyle, res)
     else:
@@ -113,7 +112,7 @@ def group_show(ctx, oformat, ostyle, userid):
                 udata["username"],
                 udata["domain"],
             )
-            e = create_engine(ctx.gconfig.get("db", "rwurl"))
+            e = ctx.dbroengine()
             res = e.execute(
                 "select * from grp where username={0!r} and domain={1!r}".format(
                     udata["username"], udata["domain"],
@@ -1,8 +1,8 @@
 import click
-from sqlalchemy import create_engine
 from kamcli.ioutils import ioutils_dbres_print
 from kamcli.cli import pass_context
 from kamcli.iorpc import command_ctl
+from kamcli.iorpc import command_ctl_batch
 
 
 @click.group(
@@ -43,8 +43,9 @@ def htable_get(ctx, htname, itname):
     if not itname:
         command_ctl(ctx, "htable.dump", [htname])
     else:
-        for itn in itname:
-            command_ctl(ctx, "htable.get", [htname, itn])
+        command_ctl_batch(
+            ctx, [["htable.get", [htname, itn]] for itn in itname]
+        )
 
 
 @cli.command("sets", short_help="Set $sht(htname=>itname) to string value")
@@ -286,7 +287,7 @@ def htable_dbadd(
     ctx.vlog(
         "Adding to htable [%s] record [%s] => [%s]", dbtname, keyname, keyvalue
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     dbname = dbtname.encode("ascii", "ignore").decode()
     col_kname = colkeyname.encode("ascii", "ignore").decode()
     col_kvalue = colkeyvalue.encode("ascii", "ignore").decode()
@@ -345,7 +346,7 @@ def htable_dbrm(ctx, dbtname, colkeyname, yes, keyname):
         if option != "y":
             ctx.vlog("Skip removing item [%s]", keyname)
             return
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute(
         "delete from {0} where {1}={2!r}".format(
             dbtname.encode("ascii", "ignore").decode(),
@@ -360,7 +361,7 @@ def htable_dbrm(ctx, dbtname, colkeyname, yes, keyname):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -392,7 +393,7 @@ def htable_dbshow(ctx, oformat, ostyle, dbtname, colkeyname, keyname):
     Parameters:
         <keyname> - key name to match the record (optional)
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbroengine()
     if not keyname:
         ctx.vlog("Showing all htable database records")
         res = e.execute(
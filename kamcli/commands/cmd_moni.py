@@ -1,9 +1,10 @@
 import os
 import time
 import click
-import json
 from kamcli.cli import pass_context
 from kamcli.iorpc import command_ctl
+from kamcli.iojson import iojson_loads
+from kamcli.iojson import iojson_dumps
 
 
 @click.command("moni", short_help="Monitor relevant statistics")
@@ -64,10 +65,10 @@ def cli(ctx, norefresh):
 def cmd_moni_result_print(ctx, response, params=None):
     ctx.vlog("formatting the response for command ps")
     print()
-    rdata = json.loads(response.decode())
+    rdata = iojson_loads(response)
     if "result" in rdata:
         rd = rdata["result"]
         for a, b in zip(rd[::2], rd[1::2]):
             print("{:<40}{:<}".format(a, b))
     else:
-        print(json.dumps(rdata, indent=4, separators=(",", ": ")))
+        print(iojson_dumps(rdata, pretty=True))
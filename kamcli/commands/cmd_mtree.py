@@ -1,5 +1,4 @@
 import click
-from sqlalchemy import create_engine
 from kamcli.ioutils import ioutils_dbres_print
 from kamcli.cli import pass_context
 from kamcli.iorpc import command_ctl
@@ -50,7 +49,7 @@ def mtree_dbadd(ctx, tname, coltprefix, coltvalue, dbtname, tprefix, tvalue):
     ctx.vlog(
         "Adding to tree [%s] record [%s] => [%s]", dbtname, tprefix, tvalue
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     dbname = dbtname.encode("ascii", "ignore").decode()
     col_pref = coltprefix.encode("ascii", "ignore").decode()
     col_val = coltvalue.encode("ascii", "ignore").decode()
@@ -103,7 +102,7 @@ def mtree_dbrm(ctx, coltprefix, yes, dbtname, tprefix):
         if option != "y":
             ctx.vlog("Skip removing prefix [%s]", tprefix)
             return
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute(
         "delete from {0} where {1}={2!r}".format(
             dbtname.encode("ascii", "ignore").decode(),
@@ -118,7 +117,7 @@ def mtree_dbrm(ctx, coltprefix, yes, dbtname, tprefix):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -146,7 +145,7 @@ def mtree_dbshow(ctx, oformat, ostyle, coltprefix, dbtname, tprefix):
         <dbtname> - name of tree database table
         <tprefix> - tree prefix value to match the record
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbroengine()
     if not tprefix:
         ctx.vlog("Showing all tree database records")
         res = e.execute(
@@ -1,5 +1,4 @@
 import click
-from sqlalchemy import create_engine
 from kamcli.ioutils import ioutils_dbres_print
 from kamcli.cli import pass_context
 from kamcli.iorpc import command_ctl
@@ -46,7 +45,7 @@ def pipelimit_dbadd(ctx, dbtname, alg, pipeid, limit):
         limit,
         alg,
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     dbtval = dbtname.encode("ascii", "ignore").decode()
     pidval = pipeid.encode("ascii", "ignore").decode()
     algval = alg.encode("ascii", "ignore").decode()
@@ -62,7 +61,7 @@ def pipelimit_dbadd(ctx, dbtname, alg, pipeid, limit):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -88,7 +87,7 @@ def pipelimit_dbshow(ctx, oformat, ostyle, dbtname, pipeid):
     Parameters:
         <pipeid> - pipe name id (optional)
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbroengine()
     if not pipeid:
         ctx.vlog("Showing all pipelimit database records")
         res = e.execute(
@@ -136,7 +135,7 @@ def pipelimit_dbrm(ctx, dbtname, yes, pipeid):
         if option != "y":
             ctx.vlog("Skip removing pipe [%s]", pipeid)
             return
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute(
         "delete from {0} where pipeid={1!r}".format(
             dbtname.encode("ascii", "ignore").decode(),
@@ -1,7 +1,8 @@
 import click
-import json
 from kamcli.cli import pass_context
 from kamcli.iorpc import command_ctl
+from kamcli.iojson import iojson_loads
+from kamcli.iojson import iojson_dumps
 
 
 @click.command("ps", short_help="Print the list of kamailio processes")
@@ -17,9 +18,9 @@ def cli(ctx):
 # callback to print the result of the rpc command
 def cmd_ps_result_print(ctx, response, params=None):
     ctx.vlog("formatting the response for command ps")
-    rdata = json.loads(response.decode())
+    rdata = iojson_loads(response)
     if "result" in rdata:
         for r in rdata["result"]:
             ctx.printf("%4d %5d %s", r["IDX"], r["PID"], r["DSC"])
     else:
-        print(json.dumps(rdata, indent=4, separators=(",", ": ")))
+        print(iojson_dumps(rdata, pretty=True))
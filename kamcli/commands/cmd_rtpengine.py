@@ -1,5 +1,4 @@
 import click
-from sqlalchemy import create_engine
 from kamcli.ioutils import ioutils_dbres_print
 from kamcli.cli import pass_context
 from kamcli.iorpc import command_ctl
@@ -20,7 +19,7 @@ def cli(ctx):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -39,7 +38,7 @@ def rtpengine_showdb(ctx, oformat, ostyle):
     Parameters:
         none
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbroengine()
     ctx.vlog("Showing all rtpengine database records")
     res = e.execute("select * from rtpengine")
     ioutils_dbres_print(ctx, oformat, ostyle, res)
@@ -31,14 +31,6 @@ import click.parser
 from kamcli.cli import pass_context
 from kamcli.iorpc import command_ctl
 from collections import defaultdict
-from prompt_toolkit.completion import Completer, Completion
-from prompt_toolkit.history import InMemoryHistory
-from prompt_toolkit.shortcuts import prompt
-from prompt_toolkit.history import FileHistory
-from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
-from prompt_toolkit.styles import Style
-from prompt_toolkit.lexers import PygmentsLexer
-from pygments.lexers.shell import BashLexer
 import os
 import shlex
 import sys
@@ -149,75 +141,95 @@ _register_internal_command(
 )
 
 
-class ClickCompleter(Completer):
-    def __init__(self, cli):
-        self.cli = cli
+def shell_click_completer(cli):
+    """Return the prompt_toolkit completer for kamcli commands
 
-    def get_completions(self, document, complete_event=None):
-        # Code analogous to click._bashcomplete.do_complete
+    \b
+    The prompt_toolkit package is loaded only when the shell is started.
+    """
+    from prompt_toolkit.completion import Completer, Completion
 
-        try:
-            args = shlex.split(document.text_before_cursor)
-        except ValueError:
-            # Invalid command, perhaps caused by missing closing quotation.
-            return
+    class ClickCompleter(Completer):
+        def __init__(self, cli):
+            self.cli = cli
 
-        cursor_within_command = (
-            document.text_before_cursor.rstrip() == document.text_before_cursor
-        )
+        def get_completions(self, document, complete_event=None):
+            # Code analogous to click._bashcomplete.do_complete
 
-        if args and cursor_within_command:
-            # We've entered some text and no space, give completions for the
-            # current word.
-            incomplete = args.pop()
-        else:
-            # We've not entered anything, either at all or for the current
-            # command, so give all relevant completions for this context.
-            incomplete = ""
-
-        ctx = click._bashcomplete.resolve_ctx(self.cli, "", args)
-        if ctx is None:
-            return
-
-        choices = []
-        if (len(args) == 1) and (ctx.command.name == "jsonrpc"):
-            for it in _ksr_rpc_commands:
-                choices.append(Completion(str(it), -len(incomplete)))
-        if (len(args) == 2) and (args[0] == "srv") and (args[1] == "rpchelp"):
-            for it in _ksr_rpc_commands:
-                choices.append(Completion(str(it), -len(incomplete)))
-        for param in ctx.command.params:
-            if isinstance(param, click.Option):
-                for options in (param.opts, param.secondary_opts):
-                    for o in options:
-                        choices.append(
-                            Completion(
-                                str(o),
-                                -len(incomplete),
-                                display_meta=param.help,
+            try:
+                args = shlex.split(document.text_before_cursor)
+            except ValueError:
+                # Invalid command, perhaps caused by missing closing quotation.
+                return
+
+            cursor_within_command = (
+                document.text_before_cursor.rstrip()
+                == document.text_before_cursor
+            )
+
+            if args and cursor_within_command:
+                # We've entered some text and no space, give completions for
+                # the current word.
+                incomplete = args.pop()
+            else:
+                # We've not entered anything, either at all or for the current
+                # command, so give all relevant completions for this context.
+                incomplete = ""
+
+            ctx = click._bashcomplete.resolve_ctx(self.cli, "", args)
+            if ctx is None:
+                return
+
+            choices = []
+            if (len(args) == 1) and (ctx.command.name == "jsonrpc"):
+                for it in _ksr_rpc_commands:
+                    choices.append(Completion(str(it), -len(incomplete)))
+            if (
+                (len(args) == 2)
+                and (args[0] == "srv")
+                and (args[1] == "rpchelp")
+            ):
+                for it in _ksr_rpc_commands:
+                    choices.append(Completion(str(it), -len(incomplete)))
+            for param in ctx.command.params:
+                if isinstance(param, click.Option):
+                    for options in (param.opts, param.secondary_opts):
+                        for o in options:
+                            choices.append(
+                                Completion(
+                                    str(o),
+                                    -len(incomplete),
+                                    display_meta=param.help,
+                                )
+                            )
+                elif isinstance(param, click.Argument):
+                    if isinstance(param.type, click.Choice):
+                        for choice in param.type.choices:
+                            choices.append(
+                                Completion(str(choice), -len(incomplete))
                             )
-                        )
-            elif isinstance(param, click.Argument):
-                if isinstance(param.type, click.Choice):
-                    for choice in param.type.choices:
-                        choices.append(
-                            Completion(str(choice), -len(incomplete))
-                        )
 
-        if isinstance(ctx.command, click.MultiCommand):
-            for name in ctx.command.list_commands(ctx):
-                command = ctx.command.get_command(ctx, name)
-                choices.append(
-                    Completion(
-                        str(name),
-                        -len(incomplete),
-                        display_meta=getattr(command, "short_help"),
+            if isinstance(ctx.command, click.MultiCommand):
+                for name in ctx.command.list_commands(ctx):
+                    if hasattr(ctx.command, "command_short_help"):
+                        # kamcli commands - help from index, no import
+                        short_help = ctx.command.command_short_help(ctx, name)
+                    else:
+                        command = ctx.command.get_command(ctx, name)
+                        short_help = getattr(command, "short_help")
+                    choices.append(
+                        Completion(
+                            str(name),
+                            -len(incomplete),
+                            display_meta=short_help,
+                        )
                     )
-                )
 
-        for item in choices:
-            if item.text.startswith(incomplete):
-                yield item
+            for item in choices:
+                if item.text.startswith(incomplete):
+                    yield item
+
+    return ClickCompleter(cli)
 
 
 def bootstrap_prompt(prompt_kwargs, group):
@@ -226,11 +238,15 @@ def bootstrap_prompt(prompt_kwargs, group):
 
     :param prompt_kwargs: The user specified prompt kwargs.
     """
+    from prompt_toolkit.history import InMemoryHistory
+    from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
+    from prompt_toolkit.styles import Style
+
     prompt_kwargs = prompt_kwargs or {}
 
     defaults = {
         "history": InMemoryHistory(),
-        "completer": ClickCompleter(group),
+        "completer": shell_click_completer(group),
         "message": [("class:prompt", "kamcli > "),],
         "style": Style.from_dict({"prompt": "bold",}),
         "auto_suggest": AutoSuggestFromHistory(),
@@ -272,6 +288,7 @@ def shell_repl(
     prompt_kwargs = bootstrap_prompt(prompt_kwargs, group)
 
     if isatty:
+        from prompt_toolkit.shortcuts import prompt
 
         def get_command():
             return prompt(**prompt_kwargs)
@@ -476,6 +493,8 @@ def cli(ctx, nohistory, nosyntax, noconnect, norpcautocomplete):
             "shell", "nohistory", fallback=False
         )
     if not nohistory:
+        from prompt_toolkit.history import FileHistory
+
         dirName = os.path.expanduser("~/.kamcli")
         if not os.path.exists(dirName):
             os.mkdir(dirName)
@@ -487,6 +506,9 @@ def cli(ctx, nohistory, nosyntax, noconnect, norpcautocomplete):
     if not nosyntax:
         nosyntax = ctx.gconfig.getboolean("shell", "nosyntax", fallback=False)
     if not nosyntax:
+        from prompt_toolkit.lexers import PygmentsLexer
+        from pygments.lexers.shell import BashLexer
+
         prompt_kwargs.update({"lexer": PygmentsLexer(BashLexer)})
 
     if "shell.cmdremap" in ctx._gconfig:
@@ -1,6 +1,7 @@
 import click
 from kamcli.cli import pass_context
 from kamcli.iorpc import command_ctl
+from kamcli.iorpc import command_ctl_batch
 
 
 @click.group(
@@ -26,8 +27,7 @@ def shv_get(ctx, name):
     if not name:
         command_ctl(ctx, "pv.shvGet")
     else:
-        for n in name:
-            command_ctl(ctx, "pv.shvGet", [n])
+        command_ctl_batch(ctx, [["pv.shvGet", [n]] for n in name])
 
 
 @cli.command("sets", short_help="Set $shv(name) to string value")
@@ -1,5 +1,4 @@
 import click
-from sqlalchemy import create_engine
 from kamcli.ioutils import ioutils_dbres_print
 from kamcli.cli import pass_context
 from kamcli.cli import parse_user_spec
@@ -61,7 +60,7 @@ def speeddial_add(ctx, table, fname, lname, userid, shortdial, targeturi, desc):
         tdata["username"],
         tdata["domain"],
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     uri = "sip:{}@{}".format(tdata["username"], tdata["domain"])
     if not desc:
         e.execute(
@@ -120,7 +119,7 @@ def speeddial_rm(ctx, table, userid, shortdial):
         udata["username"],
         udata["domain"],
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     if not shortdial:
         e.execute(
             "delete from {0} where username={1!r} and domain={2!r}".format(
@@ -147,7 +146,7 @@ def speeddial_rm(ctx, table, userid, shortdial):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -176,7 +175,7 @@ def speeddial_show(ctx, oformat, ostyle, table, userid, shortdial):
         [<shortdial>] - username, AoR or SIP URI for short dial (optional)
     """
     udata = parse_user_spec(ctx, userid)
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbroengine()
 
     ctx.vlog(
         "Showing speed dial records for user [%s@%s]",
@@ -1,6 +1,7 @@
 import click
 from kamcli.cli import pass_context
 from kamcli.iorpc import command_ctl
+from kamcli.iorpc import command_ctl_batch
 
 
 @click.command("stats", short_help="Print internal statistics")
@@ -34,19 +35,21 @@ def cli(ctx, single, number, names):
     if number:
         rcmd = "stats.fetchn"
     if names:
+        cmds = []
         for n in names:
             if n.endswith(":"):
                 # enforce group name by ending with ':'
-                command_ctl(ctx, rcmd, [n])
+                cmds.append([rcmd, [n]])
             elif n.find(":") > 0:
                 # get only stat name, when providing 'group:stat'
-                command_ctl(ctx, rcmd, [n.split(":")[1]])
+                cmds.append([rcmd, [n.split(":")[1]]])
             elif single:
                 # single stat name flag
-                command_ctl(ctx, rcmd, [n])
+                cmds.append([rcmd, [n]])
             else:
                 # default is group name
-                command_ctl(ctx, rcmd, [n + ":"])
+                cmds.append([rcmd, [n + ":"]])
+        command_ctl_batch(ctx, cmds)
     else:
         # no name, print all
         command_ctl(ctx, rcmd, ["all"])
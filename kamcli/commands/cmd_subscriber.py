@@ -1,7 +1,13 @@
+import re
+import sys
+import csv
+import time
 import click
 import hashlib
-from sqlalchemy import create_engine
 from kamcli.ioutils import ioutils_dbres_print
+from kamcli.ioutils import ioutils_csv_delimiter
+from kamcli.ioutils import ioutils_file_open
+from kamcli.iojson import iojson_loads
 from kamcli.cli import pass_context
 from kamcli.cli import parse_user_spec
 
@@ -16,6 +22,17 @@ def cli(ctx):
     pass
 
 
+def subscriber_hashes(udata, password):
+    """Return the ha1 and ha1b hashes for the subscriber password"""
+    dig = "{}:{}:{}".format(udata["username"], udata["domain"], password)
+    ha1 = hashlib.md5(dig.encode()).hexdigest()
+    dig = "{}@{}:{}:{}".format(
+        udata["username"], udata["domain"], udata["domain"], password
+    )
+    ha1b = hashlib.md5(dig.encode()).hexdigest()
+    return ha1, ha1b
+
+
 @cli.command("add", short_help="Add a new subscriber")
 @click.option(
     "dbtname",
@@ -50,13 +67,8 @@ def subscriber_add(ctx, dbtname, pwtext, userid, password):
         udata["domain"],
         password,
     )
-    dig = "{}:{}:{}".format(udata["username"], udata["domain"], password)
-    ha1 = hashlib.md5(dig.encode()).hexdigest()
-    dig = "{}@{}:{}:{}".format(
-        udata["username"], udata["domain"], udata["domain"], password
-    )
-    ha1b = hashlib.md5(dig.encode()).hexdigest()
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    ha1, ha1b = subscriber_hashes(udata, password)
+    e = ctx.dbengine()
     if pwtext == "yes":
         e.execute(
             "insert into {0} (username, domain, password, ha1, ha1b) "
@@ -82,6 +94,309 @@ def subscriber_add(ctx, dbtname, pwtext, userid, password):
         )
 
 
+##
+# the columns of the imported rows that are not stored as they are
+SUBSCRIBER_IMPORT_SKIP = (
+    "userid",
+    "username",
+    "domain",
+    "password",
+    "ha1",
+    "ha1b",
+)
+
+
+def subscriber_import_reader(ctx, istream, iformat):
+    """Iterate over the rows of an import file
+
+    \b
+    Yields (lineno, row, error) tuples, row being a dictionary or None if
+    the line is not valid (error gives the reason). All rows must have the
+    fields of the csv header or of the first ndjson object.
+    """
+    if iformat == "csv":
+        reader = csv.DictReader(
+            istream, delimiter=ioutils_csv_delimiter(ctx, "db")
+        )
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, "more fields than the header"
+            elif None in row.values():
+                yield reader.line_num, None, "fewer fields than the header"
+            else:
+                yield reader.line_num, row, None
+        return
+    fields = None
+    for lineno, line in enumerate(istream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = iojson_loads(line)
+        except ValueError:
+            yield lineno, None, "invalid JSON document"
+            continue
+        if not isinstance(row, dict):
+            yield lineno, None, "not a JSON object"
+            continue
+        if fields is None:
+            fields = set(row.keys())
+        elif set(row.keys()) != fields:
+            yield lineno, None, "fields not matching the first object"
+            continue
+        yield lineno, row, None
+
+
+def subscriber_import_query(e, dbtname, columns, onduplicate):
+    """Return the insert query for the import of subscribers
+
+    \b
+    The duplicate subscribers (same username and domain) can be skipped or
+    updated with the imported values, using the upsert statement of the
+    database server, otherwise the insert fails.
+    """
+    query = "INSERT INTO {0} ({1}) VALUES ({2})".format(
+        dbtname,
+        ", ".join(columns),
+        ", ".join(":" + c for c in columns),
+    )
+    ucolumns = [c for c in columns if c not in ("username", "domain")]
+    if e.dialect.name == "mysql":
+        if onduplicate == "skip":
+            query = "INSERT IGNORE" + query[6:]
+        elif onduplicate == "update":
+            query += " ON DUPLICATE KEY UPDATE " + ", ".join(
+                "{0}=VALUES({0})".format(c) for c in ucolumns
+            )
+    elif onduplicate == "skip":
+        query += " ON CONFLICT (username, domain) DO NOTHING"
+    elif onduplicate == "update":
+        query += " ON CONFLICT (username, domain) DO UPDATE SET " + ", ".join(
+            "{0}=excluded.{0}".format(c) for c in ucolumns
+        )
+    return query
+
+
+def subscriber_import_exec(
+    ctx, e, dbtname, pwtext, rows, chunksize, onduplicate, progress=False
+):
+    """Insert the subscribers from the rows iterator in chunks
+
+    \b
+    Each row has the userid (or username and optionally domain) and the
+    password, the other fields being stored in the columns with the same
+    name. The columns are given by the first row. The ha1 and ha1b hashes
+    are computed for each row and the chunks of rows are inserted with one
+    executemany, each in its own transaction. The invalid rows are skipped.
+    Returns the number of processed rows, of rows affected in database (-1
+    if not known) and of invalid rows.
+    """
+    from sqlalchemy.sql import text
+
+    query = None
+    columns = None
+    params = []
+    nrows = 0
+    naffected = 0
+    nbad = 0
+    for lineno, row, error in rows:
+        if error is None:
+            userid = row.get("userid")
+            if not userid:
+                userid = row.get("username")
+                if userid and row.get("domain"):
+                    userid += "@" + row["domain"]
+            if not userid or row.get("password") is None:
+                error = "no user or password"
+        if error is not None:
+            ctx.log("skipping line {0}: {1}".format(lineno, error))
+            nbad += 1
+            continue
+        password = row["password"]
+        if columns is None:
+            columns = ["username", "domain", "ha1", "ha1b"]
+            if pwtext == "yes":
+                columns.append("password")
+            for c in row.keys():
+                if c in SUBSCRIBER_IMPORT_SKIP:
+                    continue
+                if re.match(r"^\w+$", c) is None:
+                    ctx.log("invalid column name: " + c)
+                    sys.exit()
+                columns.append(c)
+            query = text(
+                subscriber_import_query(e, dbtname, columns, onduplicate)
+            )
+        udata = parse_user_spec(ctx, userid)
+        password = str(password)
+        ha1, ha1b = subscriber_hashes(udata, password)
+        prow = {c: row.get(c) for c in columns}
+        prow.update(udata)
+        prow["ha1"] = ha1
+        prow["ha1b"] = ha1b
+        if pwtext == "yes":
+            prow["password"] = password.encode("ascii", "ignore").decode()
+        params.append(prow)
+        if len(params) < chunksize:
+            continue
+        naffected += subscriber_import_chunk(ctx, e, query, params, nrows)
+        nrows += len(params)
+        params = []
+        if progress:
+            click.echo(
+                "\rprocessed subscribers: {0}".format(nrows),
+                nl=False,
+                err=True,
+            )
+    if params:
+        naffected += subscriber_import_chunk(ctx, e, query, params, nrows)
+        nrows += len(params)
+    if progress and nrows > 0:
+        click.echo(err=True)
+    if not e.dialect.supports_sane_multi_rowcount:
+        naffected = -1
+    return nrows, naffected, nbad
+
+
+def subscriber_import_chunk(ctx, e, query, params, nrows):
+    """Insert a chunk of subscribers in one transaction
+
+    \b
+    Returns the number of rows affected in database (inserted or updated).
+    """
+    from sqlalchemy.exc import DBAPIError
+
+    try:
+        with e.connect() as c:
+            with c.begin():
+                res = c.execute(query, params)
+    except DBAPIError as emsg:
+        ctx.log(
+            "failed to insert subscribers after row {0}: {1}".format(
+                nrows, emsg.orig
+            )
+        )
+        sys.exit()
+    ctx.vlog("processed subscribers: {0}".format(nrows + len(params)))
+    return res.rowcount
+
+
+@cli.command("import", short_help="Import subscribers from a file")
+@click.option(
+    "dbtname",
+    "--dbtname",
+    "-T",
+    default="subscriber",
+    help='Database table name (default: "subscriber")',
+)
+@click.option(
+    "pwtext",
+    "--text-password",
+    "-t",
+    type=click.Choice(["yes", "no"]),
+    default="yes",
+    help="Store password in clear text (default yes)",
+)
+@click.option(
+    "iformat",
+    "--input-format",
+    "-f",
+    type=click.Choice(["csv", "ndjson"]),
+    default=None,
+    help="Format of the file (default: by file name, csv)",
+)
+@click.option(
+    "chunksize",
+    "--chunk-size",
+    "-c",
+    type=int,
+    default=1000,
+    help="Number of subscribers inserted per transaction (default: 1000)",
+)
+@click.option(
+    "onduplicate",
+    "--on-duplicate",
+    "-d",
+    type=click.Choice(["error", "skip", "update"]),
+    default="error",
+    help="Action for existing subscribers (default: error)",
+)
+@click.option(
+    "progress",
+    "--progress",
+    "-p",
+    is_flag=True,
+    help="Print the number of imported subscribers",
+)
+@click.argument("ifile", metavar="<file>")
+@pass_context
+def subscriber_import(
+    ctx, dbtname, pwtext, iformat, chunksize, onduplicate, progress, ifile
+):
+    """Import subscribers from a csv or ndjson file
+
+    \b
+    Parameters:
+        <file> - the file with subscribers ("-" for stdin)
+                 - csv with header or ndjson (one object per line)
+                 - fields: userid or username (and domain), password, other
+                   columns of the subscriber table
+                 - it can be compressed (.gz, .bz2, .xz)
+    \b
+    Examples:
+        - kamcli subscriber import -c 5000 users.csv.gz
+        - kamcli subscriber import -d update -f ndjson -
+    """
+    if chunksize < 1:
+        ctx.log("invalid chunk size: " + str(chunksize))
+        sys.exit()
+    if iformat is None:
+        iformat = "csv"
+        if re.search(r"\.(ndjson|jsonl)(\.(gz|bz2|xz))?$", ifile):
+            iformat = "ndjson"
+    dbtname = dbtname.encode("ascii", "ignore").decode()
+    ctx.vlog("Importing subscribers from: " + ifile)
+    e = ctx.dbengine()
+    tstart = time.time()
+    if ifile == "-":
+        nrows, naffected, nbad = subscriber_import_exec(
+            ctx,
+            e,
+            dbtname,
+            pwtext,
+            subscriber_import_reader(ctx, sys.stdin, iformat),
+            chunksize,
+            onduplicate,
+            progress,
+        )
+    else:
+        try:
+            istream = ioutils_file_open(ifile, "rt")
+        except OSError as emsg:
+            ctx.log("cannot open the file: " + str(emsg))
+            sys.exit()
+        with istream:
+            nrows, naffected, nbad = subscriber_import_exec(
+                ctx,
+                e,
+                dbtname,
+                pwtext,
+                subscriber_import_reader(ctx, istream, iformat),
+                chunksize,
+                onduplicate,
+                progress,
+            )
+    tdiff = time.time() - tstart
+    ctx.printf(
+        "processed subscribers: {0} in {1:.2f}s ({2:.0f} rows/s)".format(
+            nrows, tdiff, nrows / tdiff if tdiff > 0 else 0
+        )
+    )
+    if naffected >= 0:
+        ctx.printf("affected rows in database: {0}".format(naffected))
+    if nbad > 0:
+        ctx.printf("skipped invalid rows: {0}".format(nbad))
+
+
 @cli.command("rm", short_help="Remove an existing subscriber")
 @click.option(
     "dbtname",
@@ -114,7 +429,7 @@ def subscriber_rm(ctx, dbtname, yes, userid):
             return
     udata = parse_user_spec(ctx, userid)
     ctx.log("Removing subscriber [%s@%s]", udata["username"], udata["domain"])
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute(
         "delete from {0} where username={1!r} and domain={2!r}".format(
             dbtname.encode("ascii", "ignore").decode(),
@@ -158,13 +473,8 @@ def subscriber_passwd(ctx, dbtname, pwtext, userid, password):
         udata["domain"],
         password,
     )
-    dig = "{}:{}:{}".format(udata["username"], udata["domain"], password)
-    ha1 = hashlib.md5(dig.encode()).hexdigest()
-    dig = "{}@{}:{}:{}".format(
-        udata["username"], udata["domain"], udata["domain"], password
-    )
-    ha1b = hashlib.md5(dig.encode()).hexdigest()
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    ha1, ha1b = subscriber_hashes(udata, password)
+    e = ctx.dbengine()
     if pwtext == "yes":
         e.execute(
             "update {0} set password={1!r}, ha1={2!r}, ha1b={3!r} where "
@@ -202,7 +512,7 @@ def subscriber_passwd(ctx, dbtname, pwtext, userid, password):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -226,7 +536,7 @@ def subscriber_show(ctx, dbtname, oformat, ostyle, userid):
     """
     if not userid:
         ctx.vlog("Showing all subscribers")
-        e = create_engine(ctx.gconfig.get("db", "rwurl"))
+        e = ctx.dbroengine()
         res = e.execute(
             "select * from {0}".format(
                 dbtname.encode("ascii", "ignore").decode()
@@ -234,6 +544,7 @@ def subscriber_show(ctx, dbtname, oformat, ostyle, userid):
         )
         ioutils_dbres_print(ctx, oformat, ostyle, res)
     else:
+        e = ctx.dbroengine()
         for u in userid:
             udata = parse_user_spec(ctx, u)
             ctx.vlog(
@@ -241,7 +552,6 @@ def subscriber_show(ctx, dbtname, oformat, ostyle, userid):
                 udata["username"],
                 udata["domain"],
             )
-            e = create_engine(ctx.gconfig.get("db", "rwurl"))
             res = e.execute(
                 "select * from {0} where username={1!r} and domain={2!r}".format(
                     dbtname.encode("ascii", "ignore").decode(),
@@ -282,7 +592,7 @@ def subscriber_setattrs(ctx, dbtname, userid, attr, val):
         attr,
         val,
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute(
         "update {0} set {1}={2!r} where username={3!r} and "
         "domain={4!r}".format(
@@ -327,7 +637,7 @@ def subscriber_setattri(ctx, dbtname, userid, attr, val):
         attr,
         val,
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute(
         "update {0} set {1}={2} where username={3!r} and "
         "domain={4!r}".format(
@@ -369,7 +679,7 @@ def subscriber_setattrnull(ctx, dbtname, userid, attr):
         udata["domain"],
         attr,
     )
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute(
         "update {0} set {1}=NULL where username={2!r} and "
         "domain={3!r}".format(
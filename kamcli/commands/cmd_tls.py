@@ -1,7 +1,6 @@
 import sys
 import os
 import click
-from sqlalchemy import create_engine
 from kamcli.ioutils import ioutils_dbres_print
 from kamcli.cli import pass_context
 from kamcli.iorpc import command_ctl
@@ -18,7 +17,7 @@ def cli(ctx):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -35,7 +34,7 @@ def tls_showdb(ctx, oformat, ostyle):
 
     \b
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbroengine()
     ctx.vlog("Showing all tlscfg records")
     res = e.execute("select * from tlscfg")
     ioutils_dbres_print(ctx, oformat, ostyle, res)
@@ -59,7 +58,7 @@ def tls_cfgprint(ctx, odir, cfgpath):
     \b
         [<cfgpath>] - config file path (optional)
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbroengine()
     ctx.vlog("Generating TLS config from database records")
     res = e.execute("select * from tlscfg")
 
@@ -1,9 +1,9 @@
 import click
 import os
-import json
 import datetime
 from kamcli.cli import pass_context
 from kamcli.iorpc import command_ctl
+from kamcli.iojson import iojson_loads
 
 
 @click.command(
@@ -98,7 +98,7 @@ def cmd_trap_print(ctx, response, params=None):
         outfile.write(
             "\n---end core.psx -------------------------------------------------------\n\n"
         )
-    rdata = json.loads(response.decode())
+    rdata = iojson_loads(response)
     if "result" in rdata:
         ctx.printf(
             "Trapping "
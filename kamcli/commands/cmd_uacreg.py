@@ -1,5 +1,4 @@
 import click
-from sqlalchemy import create_engine
 from kamcli.ioutils import ioutils_dbres_print
 from kamcli.cli import pass_context
 from kamcli.iorpc import command_ctl
@@ -84,7 +83,7 @@ def uacreg_add(
         ha1val = auth_password
     else:
         pwval = auth_password
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute(
         "insert into uacreg (l_uuid, l_username, l_domain, r_username, "
         "r_domain, realm, auth_username, auth_password, auth_ha1, auth_proxy, "
@@ -137,7 +136,7 @@ def uacreg_passwd(ctx, realm, authha1, l_uuid, auth_password):
         ha1val = auth_password
     else:
         pwval = auth_password
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbengine()
     e.execute(
         "update uacreg set auth_password={0!r}, auth_ha1={1!r} "
         "where l_uuid={2!r}".format(
@@ -153,7 +152,7 @@ def uacreg_passwd(ctx, realm, authha1, l_uuid, auth_password):
     "oformat",
     "--output-format",
     "-F",
-    type=click.Choice(["raw", "json", "table", "dict"]),
+    type=click.Choice(["raw", "json", "table", "dict", "ndjson", "csv"]),
     default=None,
     help="Format the output",
 )
@@ -173,7 +172,7 @@ def uacreg_showdb(ctx, oformat, ostyle, l_uuid):
     Parameters:
         [<l_uuid>] - local user unique id
     """
-    e = create_engine(ctx.gconfig.get("db", "rwurl"))
+    e = ctx.dbroengine()
     if not l_uuid:
         ctx.vlog("Showing all uacreg records")
         res = e.execute("select * from uacreg")
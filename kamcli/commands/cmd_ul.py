@@ -1,10 +1,10 @@
 import click
-from sqlalchemy import create_engine
 from kamcli.ioutils import ioutils_dbres_print
 from kamcli.ioutils import ioutils_formats_list
 from kamcli.cli import pass_context
 from kamcli.cli import parse_user_spec
 from kamcli.iorpc import command_ctl
+from kamcli.iorpc import command_ctl_batch
 
 
 @click.group(
@@ -45,6 +45,7 @@ def ul_show(ctx, brief, table, userid):
         else:
             command_ctl(ctx, "ul.dump", [])
     else:
+        cmds = []
         for u in userid:
             udata = parse_user_spec(ctx, u)
             ctx.vlog(
@@ -53,7 +54,8 @@ def ul_show(ctx, brief, table, userid):
                 udata["domain"],
             )
             aor = udata["username"] + "@" + udata["domain"]
-            command_ctl(ctx, "ul.lookup", [table, aor])
+            cmds.append(["ul.lookup", [table, aor]])
+        command_ctl_batch(ctx, cmds)
 
 
 @cli.command("add", short_help="Add location record")
@@ -121,8 +123,7 @@ def ul_rm(ctx, table, userid, curi):
     ctx.vlog("Showing record for [%s@%s]", udata["username"], udata["domain"])
     aor = udata["username"] + "@" + udata["domain"]
     if curi:
-        for c in curi:
-            command_ctl(ctx, "ul.rm", [table, aor, c])
+        command_ctl_batch(ctx, [["ul.rm", [table, aor, c]] for c in curi])
     else:
         command_ctl(ctx, "ul.rm", [table, aor])
 
@@ -158,10 +159,11 @@ def ul_showdb(ctx, oformat, ostyle, userid):
     """
     if not userid:
         ctx.vlog("Showing all records")
-        e = create_engine(ctx.gconfig.get("db", "rwurl"))
+        e = ctx.dbroengine()
         res = e.execute("select * from location")
         ioutils_dbres_print(ctx, oformat, ostyle, res)
     else:
+        e = ctx.dbroengine()
         for u in userid:
             udata = parse_user_spec(ctx, u)
             ctx.vlog(
@@ -169,7 +171,6 @@ def ul_showdb(ctx, oformat, ostyle, userid):
                 udata["username"],
                 udata["domain"],
             )
-            e = create_engine(ctx.gconfig.get("db", "rwurl"))
             res = e.execute(
                 "select * from location where username={0!r} and domain={1!r}".format(
                     udata["username"], udata["domain"],
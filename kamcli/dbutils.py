@@ -1,7 +1,4 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.sql import text
-from sqlalchemy.exc import SQLAlchemyError
 
 
 KDB_IGNORE_MISSING = [
@@ -10,7 +7,148 @@ KDB_IGNORE_MISSING = [
 ]
 
 
+def dbutils_create_engine(*args, **kwargs):
+    """Create a database engine
+
+    \b
+    SQLAlchemy is loaded only when the first database engine is created,
+    the commands not using the database do not pay its import time.
+    """
+    from sqlalchemy import create_engine
+
+    return create_engine(*args, **kwargs)
+
+
+def dbutils_engine_options(ctx, url):
+    """Return the options for creating the engine of a database url
+
+    \b
+    The connection pool options are taken from db config section:
+      - poolsize: number of connections kept open in the pool
+      - poolmaxoverflow: number of connections allowed over poolsize
+      - pooltimeout: seconds to wait for a connection from the pool
+      - poolrecycle: seconds after which a connection is reopened
+      - poolpreping: check the connection before using it (yes/no)
+    The size and timeout options are not used for SQLite, the driver
+    does not use a queue pool for it.
+    """
+    dbopts = {}
+    if not url.startswith("sqlite"):
+        ival = ctx.gconfig.getint("db", "poolsize", fallback=None)
+        if ival is not None:
+            dbopts["pool_size"] = ival
+        ival = ctx.gconfig.getint("db", "poolmaxoverflow", fallback=None)
+        if ival is not None:
+            dbopts["max_overflow"] = ival
+        ival = ctx.gconfig.getint("db", "pooltimeout", fallback=None)
+        if ival is not None:
+            dbopts["pool_timeout"] = ival
+    ival = ctx.gconfig.getint("db", "poolrecycle", fallback=None)
+    if ival is not None:
+        dbopts["pool_recycle"] = ival
+    if ctx.gconfig.getboolean("db", "poolpreping", fallback=False):
+        dbopts["pool_pre_ping"] = True
+    return dbopts
+
+
+def dbutils_roengine(ctx):
+    """Return the database engine for read only queries
+
+    \b
+    The engine is selected based on db config section attributes:
+      - rorouting: if set to no, the rwurl engine is used
+      - rourls: list of urls of read only replicas, separated by space or
+                comma, used round-robin starting from a position given by
+                process id, so many kamcli instances spread over them
+      - rourl: the url used if rourls is not set
+    If none of the read only databases can be connected, the rwurl engine
+    is used.
+    The results of the queries are streamed with server side cursors (when
+    the database driver supports them), buffering up to fetchsize rows.
+    """
+    e = dbutils_roengine_select(ctx)
+    fetchsize = ctx.gconfig.getint("db", "fetchsize", fallback=1000)
+    if fetchsize < 1:
+        fetchsize = 1000
+    return e.execution_options(stream_results=True, max_row_buffer=fetchsize)
+
+
+def dbutils_roengine_select(ctx):
+    from sqlalchemy.exc import SQLAlchemyError
+
+    if not ctx.gconfig.getboolean("db", "rorouting", fallback=True):
+        return ctx.dbengine()
+    urls = ctx.gconfig.get("db", "rourls", fallback="").replace(",", " ")
+    urls = urls.split()
+    if not urls:
+        url = ctx.gconfig.get("db", "rourl", fallback=None)
+        if not url:
+            return ctx.dbengine()
+        urls = [url]
+    if ctx.dbroindex is None:
+        ctx.dbroindex = os.getpid() % len(urls)
+    for i in range(len(urls)):
+        url = urls[ctx.dbroindex % len(urls)]
+        ctx.dbroindex = (ctx.dbroindex + 1) % len(urls)
+        e = ctx.dbengine(url=url)
+        try:
+            with e.connect():
+                pass
+            return e
+        except SQLAlchemyError as emsg:
+            ctx.vlog("cannot connect to read only database: " + str(emsg))
+    ctx.log("read only database not available - using rwurl")
+    return ctx.dbengine()
+
+
+def dbutils_sql_hours_ago(e, hours):
+    """Return the SQL expression for the local time some hours ago
+
+    \b
+    The expression is built for the dialect of the database engine (MySQL,
+    PostgreSQL or SQLite), to be compared with datetime columns.
+    """
+    dialect = e.dialect.name
+    if dialect == "postgresql":
+        return "LOCALTIMESTAMP - INTERVAL '{0} hours'".format(int(hours))
+    if dialect == "sqlite":
+        return "datetime('now', 'localtime', '-{0} hours')".format(int(hours))
+    return "DATE_SUB(NOW(), INTERVAL {0} HOUR)".format(int(hours))
+
+
+##
+# granularity of time buckets - formats for MySQL and SQLite
+DBUTILS_TIME_BUCKETS = {
+    "minute": ("%%Y-%%m-%%d %%H:%%i:00", "%Y-%m-%d %H:%M:00"),
+    "hour": ("%%Y-%%m-%%d %%H:00:00", "%Y-%m-%d %H:00:00"),
+    "day": ("%%Y-%%m-%%d", "%Y-%m-%d"),
+}
+
+
+def dbutils_sql_time_bucket(e, column, granularity):
+    """Return the SQL expression truncating a datetime column
+
+    \b
+    The granularity can be: minute, hour or day. The expression is built for
+    the dialect of the database engine (MySQL, PostgreSQL or SQLite).
+    """
+    dialect = e.dialect.name
+    if dialect == "postgresql":
+        return "date_trunc('{0}', {1})".format(granularity, column)
+    if dialect == "sqlite":
+        return "strftime('{0}', {1})".format(
+            DBUTILS_TIME_BUCKETS[granularity][1], column
+        )
+    # '%' is escaped for the format style of the driver parameters
+    return "DATE_FORMAT({0}, '{1}')".format(
+        column, DBUTILS_TIME_BUCKETS[granularity][0]
+    )
+
+
 def dbutils_exec_sqlfile(ctx, sqlengine, fname):
+    from sqlalchemy.sql import text
+    from sqlalchemy.exc import SQLAlchemyError
+
     if not os.path.exists(fname):
         for i in KDB_IGNORE_MISSING:
             if i in fname:
@@ -39,6 +177,9 @@ def dbutils_exec_sqlfile(ctx, sqlengine, fname):
 
 
 def dbutils_exec_sqltext(ctx, sqlengine, sqltext):
+    from sqlalchemy.sql import text
+    from sqlalchemy.exc import SQLAlchemyError
+
     sql_command = ""
     for line in sqltext.splitlines():
         tline = line.strip(" \t\r\n")
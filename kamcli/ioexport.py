@@ -0,0 +1,362 @@
+import os
+import csv
+import json
+import importlib.util
+from collections import Counter
+from kamcli.ioutils import ioutils_dbrows_write
+from kamcli.ioutils import ioutils_file_open
+
+##
+# enable parquet format if pyarrow can be found (loaded when used)
+ioexport_parquet_format = importlib.util.find_spec("pyarrow") is not None
+
+##
+# time buckets computed from "YYYY-MM-DD HH:MM:SS" strings
+IOEXPORT_TIME_BUCKETS = {
+    "minute": (16, ":00"),
+    "hour": (13, ":00:00"),
+    "day": (10, ""),
+}
+
+
+def ioexport_file_format(fpath):
+    """Return the format of an export file by its name (parquet or csv)"""
+    if fpath.endswith(".parquet"):
+        return "parquet"
+    return "csv"
+
+
+def ioexport_meta_path(fpath):
+    """Return the path of the metadata file of an export file"""
+    return fpath + ".meta.json"
+
+
+def ioexport_arrow_types(e, table):
+    """Return the dictionary with the pyarrow type of each table column
+
+    \b
+    The types are given by the columns of the table in database, the ones
+    not mapped to a pyarrow type being string. Returns None if the table
+    columns cannot be found.
+    """
+    import pyarrow as pa
+    from sqlalchemy import inspect
+    from sqlalchemy import types
+
+    try:
+        columns = inspect(e).get_columns(table)
+    except Exception:
+        return None
+    if not columns:
+        return None
+    atypes = {}
+    for col in columns:
+        ctype = col["type"]
+        if isinstance(ctype, types.Boolean):
+            atypes[col["name"]] = pa.bool_()
+        elif isinstance(ctype, types.Integer):
+            atypes[col["name"]] = pa.int64()
+        elif isinstance(ctype, types.Float):
+            atypes[col["name"]] = pa.float64()
+        elif isinstance(ctype, types.Numeric):
+            if ctype.precision and ctype.scale is not None:
+                atypes[col["name"]] = pa.decimal128(
+                    ctype.precision, ctype.scale
+                )
+            else:
+                atypes[col["name"]] = pa.float64()
+        elif isinstance(ctype, types.DateTime):
+            atypes[col["name"]] = pa.timestamp("us")
+        elif isinstance(ctype, types.Date):
+            atypes[col["name"]] = pa.date32()
+        elif isinstance(ctype, types.LargeBinary):
+            atypes[col["name"]] = pa.binary()
+        else:
+            atypes[col["name"]] = pa.string()
+    return atypes
+
+
+def ioexport_meta_read(fpath):
+    """Return the metadata of an export file (None if not available)"""
+    try:
+        with open(ioexport_meta_path(fpath), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class IOExportWriter(object):
+    """Writer of database rows to a parquet or compressed csv file
+
+    \b
+    The rows are written in chunks, as they are fetched. For parquet, each
+    chunk is a row group with the schema given by the column types (see
+    ioexport_arrow_types()), the values being converted to them. The types
+    of the columns not in atypes are given by the first chunk. Once the
+    file is closed, a metadata file (name.meta.json) is written with the
+    number of rows and min/max values of the time and id columns.
+    """
+
+    def __init__(self, fpath, oformat, table, tcolumn, idcolumn, atypes=None):
+        self.fpath = fpath
+        self.oformat = oformat
+        self.table = table
+        self.tcolumn = tcolumn
+        self.idcolumn = idcolumn
+        self.atypes = atypes or {}
+        self.aborted = False
+        self.columns = None
+        self.writer = None
+        self.ostream = None
+        self.schema = None
+        self.nrows = 0
+        self.tmin = None
+        self.tmax = None
+        self.idmin = None
+        self.idmax = None
+
+    def write_parquet(self, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        data = [dict(r) for r in rows]
+        if self.writer is None:
+            schema = pa.Table.from_pylist(data).schema
+            for i, field in enumerate(schema):
+                if field.name in self.atypes:
+                    ftype = self.atypes[field.name]
+                elif pa.types.is_null(field.type):
+                    # no type from the values of the first chunk
+                    ftype = pa.string()
+                else:
+                    continue
+                schema = schema.set(i, field.with_type(ftype))
+            self.schema = schema
+            self.writer = pq.ParquetWriter(
+                self.fpath, schema, compression="zstd"
+            )
+        try:
+            table = pa.Table.from_pylist(data, schema=self.schema)
+        except (ValueError, TypeError):
+            # values of other types (e.g., datetime strings) - convert them
+            table = pa.Table.from_pylist(data).cast(self.schema)
+        self.writer.write_table(table)
+
+    def write(self, rows):
+        """Write a list of rows (with the same columns)"""
+        if not rows:
+            return
+        if self.columns is None:
+            self.columns = list(rows[0].keys())
+        if self.oformat == "parquet":
+            self.write_parquet(rows)
+        else:
+            if self.ostream is None:
+                self.ostream = ioutils_file_open(self.fpath, "wt")
+                ioutils_dbrows_write(self.ostream, "csv", [self.columns])
+            ioutils_dbrows_write(self.ostream, "csv", rows)
+        tvals = [str(r[self.tcolumn]) for r in rows]
+        ids = [r[self.idcolumn] for r in rows]
+        if self.nrows == 0:
+            self.tmin, self.tmax = min(tvals), max(tvals)
+            self.idmin, self.idmax = min(ids), max(ids)
+        else:
+            self.tmin = min(self.tmin, min(tvals))
+            self.tmax = max(self.tmax, max(tvals))
+            self.idmin = min(self.idmin, min(ids))
+            self.idmax = max(self.idmax, max(ids))
+        self.nrows += len(rows)
+
+    def abort(self):
+        """Close and remove the file, without writing the metadata file"""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.ostream is not None:
+            self.ostream.close()
+            self.ostream = None
+        if os.path.exists(self.fpath):
+            os.remove(self.fpath)
+        self.aborted = True
+
+    def close(self):
+        """Close the file and write the metadata file"""
+        if self.aborted:
+            return
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.ostream is not None:
+            self.ostream.close()
+            self.ostream = None
+        with open(ioexport_meta_path(self.fpath), "w") as f:
+            json.dump(
+                {
+                    "table": self.table,
+                    "format": self.oformat,
+                    "rows": self.nrows,
+                    "columns": self.columns,
+                    "time_column": self.tcolumn,
+                    "time_min": self.tmin,
+                    "time_max": self.tmax,
+                    "id_min": self.idmin,
+                    "id_max": self.idmax,
+                },
+                f,
+                indent=4,
+            )
+            f.write("\n")
+
+
+def ioexport_count_arrow(fpath, keys, tcolumn, since, where, limit, bucket):
+    """Count the rows of a file grouped by keys, using pyarrow compute"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    columns = list({k for k in keys if k != "bucket"} | set(where))
+    if since is not None or bucket is not None:
+        columns.append(tcolumn)
+    columns = sorted(set(columns))
+    if ioexport_file_format(fpath) == "parquet":
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(fpath, columns=columns)
+    else:
+        from pyarrow import csv as pacsv
+
+        table = pacsv.read_csv(
+            fpath,
+            convert_options=pacsv.ConvertOptions(
+                include_columns=columns,
+                column_types={c: pa.string() for c in columns},
+                strings_can_be_null=False,
+            ),
+        )
+    # compare and group the values as strings, like in csv files
+    for name in columns:
+        col = table[name]
+        if pa.types.is_timestamp(col.type):
+            col = pc.strftime(col, format="%Y-%m-%d %H:%M:%S")
+        elif not pa.types.is_string(col.type):
+            col = pc.cast(col, pa.string())
+        table = table.set_column(table.schema.get_field_index(name), name, col)
+    mask = None
+    for name, value in where.items():
+        m = pc.equal(table[name], value)
+        mask = m if mask is None else pc.and_(mask, m)
+    if since is not None:
+        m = pc.greater_equal(table[tcolumn], since)
+        mask = m if mask is None else pc.and_(mask, m)
+    if mask is not None:
+        table = table.filter(mask)
+    if limit > 0:
+        table = table.slice(0, limit)
+    if bucket is not None:
+        blen, bsuffix = IOEXPORT_TIME_BUCKETS[bucket]
+        col = pc.utf8_slice_codeunits(table[tcolumn], 0, blen)
+        if bsuffix:
+            col = pc.binary_join_element_wise(col, bsuffix, "")
+        table = table.append_column("bucket", col)
+    res = table.group_by(keys).aggregate(
+        [(keys[0], "count", pc.CountOptions(mode="all"))]
+    )
+    counts = Counter()
+    kcols = [res[k].to_pylist() for k in keys]
+    for kvals, n in zip(zip(*kcols), res[keys[0] + "_count"].to_pylist()):
+        counts[kvals] += n
+    return counts, table.num_rows
+
+
+def ioexport_count_csv(fpath, keys, tcolumn, since, where, limit, bucket):
+    """Count the rows of a csv file grouped by keys, using csv module"""
+    with ioutils_file_open(fpath, "rt") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        idx = {name: i for i, name in enumerate(header)}
+        conds = [(idx[name], value) for name, value in where.items()]
+        tidx = idx.get(tcolumn)
+        kidx = [idx[k] if k != "bucket" else -1 for k in keys]
+        if bucket is not None:
+            blen, bsuffix = IOEXPORT_TIME_BUCKETS[bucket]
+        counts = Counter()
+        nrows = 0
+        for row in reader:
+            if conds and not all(row[i] == v for i, v in conds):
+                continue
+            if since is not None and row[tidx] < since:
+                continue
+            if bucket is not None:
+                row.append(row[tidx][:blen] + bsuffix)
+            counts[tuple(row[i] for i in kidx)] += 1
+            nrows += 1
+            if nrows == limit:
+                break
+    return counts, nrows
+
+
+def ioexport_group_count(
+    ctx,
+    files,
+    keys,
+    tcolumn="time",
+    since=None,
+    where={},
+    limit=0,
+    bucket=None,
+):
+    """Count the rows of export files grouped by the values of key columns
+
+    \b
+    Parameters:
+      - ctx: kamcli execution context
+      - files: the list of export files (parquet or csv)
+      - keys: the list of key columns, "bucket" being the time bucket
+      - tcolumn: the time column
+      - since: count only the rows with time not older (str)
+      - where: dictionary with the values the columns have to be equal to
+      - limit: count only the first limit rows (0 - no limit)
+      - bucket: the granularity of time bucket (minute, hour, day)
+    The files not having rows since the given time (in their metadata)
+    are skipped. With pyarrow, the rows are filtered and grouped with its
+    vectorized compute functions, otherwise csv files are read row by row.
+    Returns a Counter with the tuples of key values.
+    """
+    counts = Counter()
+    nrows = 0
+    for fpath in files:
+        if not os.path.exists(fpath):
+            ctx.log("export file not found: " + fpath)
+            continue
+        meta = ioexport_meta_read(fpath)
+        if meta is not None and since is not None and meta["time_max"]:
+            if meta["time_max"] < since:
+                ctx.vlog("skipping file with older records: " + fpath)
+                continue
+        if ioexport_parquet_format is True:
+            fcounts, n = ioexport_count_arrow(
+                fpath,
+                keys,
+                tcolumn,
+                since,
+                where,
+                limit - nrows if limit > 0 else 0,
+                bucket,
+            )
+        elif ioexport_file_format(fpath) == "parquet":
+            ctx.log("Package pyarrow is not installed to read: " + fpath)
+            continue
+        else:
+            fcounts, n = ioexport_count_csv(
+                fpath,
+                keys,
+                tcolumn,
+                since,
+                where,
+                limit - nrows if limit > 0 else 0,
+                bucket,
+            )
+        counts.update(fcounts)
+        nrows += n
+        if limit > 0 and nrows >= limit:
+            break
+    return counts
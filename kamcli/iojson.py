@@ -0,0 +1,116 @@
+import re
+import json
+
+##
+# use a faster JSON library if one can be loaded, otherwise the json module
+iojson_lib = "json"
+try:
+    import orjson
+
+    iojson_lib = "orjson"
+except ImportError:
+    try:
+        import ujson
+
+        iojson_lib = "ujson"
+    except ImportError:
+        pass  # no fast JSON library, use json module
+
+##
+# new line followed by indentation
+IOJSON_INDENT_RE = re.compile(rb"(\n +)")
+
+
+def iojson_loads(data):
+    """Decode a JSON document (bytes or str) to Python objects"""
+    if iojson_lib == "orjson":
+        try:
+            return orjson.loads(data)
+        except ValueError:
+            pass  # retry with json module (e.g., too large integers)
+    elif iojson_lib == "ujson":
+        try:
+            return ujson.loads(data)
+        except ValueError:
+            pass
+    return json.loads(data)
+
+
+def iojson_indent4(data):
+    """Double the indentation of JSON bytes indented with 2 spaces
+
+    \b
+    The JSON strings cannot contain raw new lines, the spaces after a new
+    line are only indentation.
+    """
+    parts = IOJSON_INDENT_RE.split(data)
+    lines = parts[1::2]
+    indents = {k: k + k[1:] for k in set(lines)}
+    parts[1::2] = map(indents.__getitem__, lines)
+    return b"".join(parts)
+
+
+def iojson_dumpb(data, pretty=False):
+    """Encode Python objects to JSON bytes
+
+    \b
+    Parameters:
+      - data: the Python objects to encode
+      - pretty: if True, indent the output with 4 spaces and separate the
+                object members by ": ", otherwise produce compact JSON
+    The non-ASCII characters are not escaped, the output is UTF-8. The
+    values that have no JSON type (e.g., datetime and decimal fields of
+    database records) are encoded as strings.
+    """
+    if iojson_lib == "orjson":
+        try:
+            if not pretty:
+                return orjson.dumps(
+                    data,
+                    default=str,
+                    option=orjson.OPT_PASSTHROUGH_DATETIME,
+                )
+            return iojson_indent4(
+                orjson.dumps(
+                    data,
+                    default=str,
+                    option=orjson.OPT_PASSTHROUGH_DATETIME
+                    | orjson.OPT_INDENT_2,
+                )
+            )
+        except TypeError:
+            pass  # retry with json module (e.g., non-str keys)
+    elif iojson_lib == "ujson":
+        try:
+            return ujson.dumps(
+                data,
+                ensure_ascii=False,
+                escape_forward_slashes=False,
+                indent=4 if pretty else 0,
+                default=str,
+            ).encode()
+        except (TypeError, OverflowError):
+            pass
+    return iojson_dumps_std(data, pretty).encode()
+
+
+def iojson_dumps(data, pretty=False):
+    """Encode Python objects to JSON str (see iojson_dumpb())"""
+    if iojson_lib == "json":
+        return iojson_dumps_std(data, pretty)
+    return iojson_dumpb(data, pretty).decode()
+
+
+def iojson_dumps_std(data, pretty=False):
+    """Encode Python objects to JSON str with json module"""
+    if pretty:
+        return json.dumps(
+            data,
+            indent=4,
+            separators=(",", ": "),
+            ensure_ascii=False,
+            default=str,
+        )
+    return json.dumps(
+        data, separators=(",", ":"), ensure_ascii=False, default=str
+    )
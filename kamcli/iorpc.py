@@ -1,23 +1,26 @@
 import os
 import os.path
+import re
+import atexit
 import sys
 import shutil
 import socket
 import stat
-import time
-import threading
+import select
+import csv
 import json
+import importlib.util
 from random import randint
 from configparser import NoOptionError
+from kamcli.iojson import iojson_loads
+from kamcli.iojson import iojson_dumpb
+from kamcli.iojson import iojson_dumps
+from kamcli.ioutils import ioutils_csv_value
+from kamcli.ioutils import ioutils_csv_delimiter
 
 ##
-# enable yaml output format if the lib can be loaded
-iorpc_yaml_format = True
-try:
-    import yaml
-except ImportError:
-    iorpc_yaml_format = False
-    pass  # yaml module doesn't exist, deal with it.
+# enable yaml output format if the lib can be found (loaded when used)
+iorpc_yaml_format = importlib.util.find_spec("yaml") is not None
 
 
 ##
@@ -82,7 +85,241 @@ def command_ctl_name(alias, ctype):
     return COMMAND_NAMES[alias]["rpc"]
 
 
-def command_ctl_response_print(response, oformat):
+##
+# whitespace between JSON tokens
+IORPC_JSON_WS_RE = re.compile(r"[ \t\n\r]*")
+
+##
+# JSON pretty formatting indentation
+IORPC_JSON_INDENT = "    "
+
+##
+# rpc commands only reading data, safe to be executed again
+IORPC_READONLY_RE = re.compile(
+    r"^[^.]+\.(get|list|dump|show|stats|info|fetch|lookup|version|uptime"
+    r"|modules|ppdefines|psx|runinfo|shmmem|tcp_|methodhelp|translate"
+    r"|briefing|stored|shvget)|(dump|list|info|stats|options|_active)$",
+    re.IGNORECASE,
+)
+
+
+def command_ctl_readonly(cmd):
+    """Return True if the rpc command only reads data (by its name)"""
+    return IORPC_READONLY_RE.search(cmd) is not None
+
+
+def command_ctl_response_walk(sdata, levels=6):
+    """Walk a JSON document and yield its members one by one
+
+    \b
+    Parameters:
+      - sdata: the JSON document (str)
+      - levels: how many levels of arrays and objects are walked member by
+                member - deeper values are decoded at once
+    Yields tuples like:
+      - ("mstart",) / ("mend",): start / end of an object
+      - ("sstart",) / ("send",): start / end of an array
+      - ("key", name): the name of the next object member
+      - ("value", value): a decoded value (scalar or deeper container)
+    Only one decoded value is kept alive at a time, the memory is not
+    growing with the size of the document.
+    """
+    decoder = json.JSONDecoder()
+    ws = IORPC_JSON_WS_RE.match
+
+    def walk(idx, level):
+        idx = ws(sdata, idx).end()
+        c = sdata[idx : idx + 1]
+        if level >= levels or (c != "{" and c != "["):
+            value, idx = decoder.raw_decode(sdata, idx)
+            yield ("value", value)
+            return idx
+        cend = "}" if c == "{" else "]"
+        idx = ws(sdata, idx + 1).end()
+        if sdata[idx : idx + 1] == cend:
+            yield ("value", {} if c == "{" else [])
+            return idx + 1
+        yield ("mstart",) if c == "{" else ("sstart",)
+        while True:
+            if c == "{":
+                key, idx = decoder.raw_decode(sdata, idx)
+                yield ("key", key)
+                idx = ws(sdata, idx).end()
+                if sdata[idx : idx + 1] != ":":
+                    raise ValueError("expected ':' at position " + str(idx))
+                idx += 1
+            idx = yield from walk(idx, level + 1)
+            idx = ws(sdata, idx).end()
+            n = sdata[idx : idx + 1]
+            if n == ",":
+                idx = ws(sdata, idx + 1).end()
+            elif n == cend:
+                yield ("mend",) if c == "{" else ("send",)
+                return idx + 1
+            else:
+                raise ValueError(
+                    "expected ',' or '" + cend + "' at position " + str(idx)
+                )
+
+    yield from walk(0, 0)
+
+
+def command_ctl_response_print_json(events, ostream):
+    """Write the walked JSON document pretty formatted to ostream"""
+    level = 0
+    stack = []
+    first = True
+    for ev in events:
+        etype = ev[0]
+        if etype == "key":
+            ostream.write(
+                ("\n" if first else ",\n")
+                + IORPC_JSON_INDENT * level
+                + iojson_dumps(ev[1])
+                + ": "
+            )
+            first = False
+            continue
+        if etype == "mend" or etype == "send":
+            level -= 1
+            stack.pop()
+            ostream.write(
+                "\n"
+                + IORPC_JSON_INDENT * level
+                + ("}" if etype == "mend" else "]")
+            )
+            first = False
+            continue
+        if stack and stack[-1]:
+            # array member
+            ostream.write(
+                ("\n" if first else ",\n") + IORPC_JSON_INDENT * level
+            )
+            first = False
+        if etype == "value":
+            sval = iojson_dumps(ev[1], pretty=True)
+            if level > 0 and isinstance(ev[1], (dict, list)):
+                sval = sval.replace("\n", "\n" + IORPC_JSON_INDENT * level)
+            ostream.write(sval)
+        else:
+            ostream.write("{" if etype == "mstart" else "[")
+            stack.append(etype == "sstart")
+            level += 1
+            first = True
+    ostream.write("\n")
+
+
+def command_ctl_response_print_yaml(events, ostream):
+    """Write the walked JSON document as yaml to ostream
+
+    \b
+    The yaml events for the walked arrays and objects are emitted directly,
+    the decoded values are serialized one by one. The object members are
+    printed in the order they come in the JSON document.
+    """
+    import yaml
+
+    dumper = yaml.SafeDumper(
+        ostream, default_flow_style=False, sort_keys=False
+    )
+    dumper.open()
+    dumper.emit(yaml.DocumentStartEvent())
+    for ev in events:
+        etype = ev[0]
+        if etype == "mstart":
+            dumper.emit(yaml.MappingStartEvent(None, None, True))
+        elif etype == "sstart":
+            dumper.emit(yaml.SequenceStartEvent(None, None, True))
+        elif etype == "mend":
+            dumper.emit(yaml.MappingEndEvent())
+        elif etype == "send":
+            dumper.emit(yaml.SequenceEndEvent())
+        else:
+            node = dumper.represent_data(ev[1])
+            dumper.anchor_node(node)
+            dumper.serialize_node(node, None, None)
+            # drop the references kept for aliases detection
+            dumper.represented_objects = {}
+            dumper.object_keeper = []
+            dumper.alias_key = None
+            dumper.serialized_nodes = {}
+            dumper.anchors = {}
+    dumper.emit(yaml.DocumentEndEvent())
+    dumper.close()
+
+
+def command_ctl_response_rows(events):
+    """Yield the items of the result array of the walked JSONRPC response
+
+    \b
+    The events have to be produced with levels=2, so that each item of the
+    result array is decoded at once. A result that is not an array (object
+    or scalar) is yielded as a single item, same for the error object.
+    """
+    level = 0
+    key = None
+    mkey = None
+    obj = None
+    for ev in events:
+        etype = ev[0]
+        if etype == "mstart" or etype == "sstart":
+            level += 1
+            if level == 2 and etype == "mstart":
+                obj = {}
+        elif etype == "mend" or etype == "send":
+            level -= 1
+            if level == 1 and obj is not None:
+                if key == "result" or key == "error":
+                    yield obj
+                obj = None
+        elif etype == "key":
+            if level == 1:
+                key = ev[1]
+            else:
+                mkey = ev[1]
+        elif level == 0:
+            yield ev[1]
+        elif key == "result" or key == "error":
+            if level == 1:
+                if ev[1] != []:
+                    # not an empty result array
+                    yield ev[1]
+            elif obj is not None:
+                obj[mkey] = ev[1]
+            else:
+                yield ev[1]
+
+
+def command_ctl_response_print_ndjson(rows, ostream):
+    """Write the rows as compact JSON documents, one per line"""
+    for row in rows:
+        ostream.write(iojson_dumps(row) + "\n")
+
+
+def command_ctl_response_print_csv(rows, ostream, delimiter=","):
+    """Write the rows in csv format
+
+    \b
+    Each row is written by its type. For object rows, the header is given
+    by the members of the first object row (missing members are written
+    empty, the others are ignored). Array rows are written with their items
+    as fields, scalars as single field.
+    """
+    writer = csv.writer(ostream, delimiter=delimiter, lineterminator="\n")
+    header = None
+    for row in rows:
+        if isinstance(row, dict):
+            if header is None:
+                header = list(row.keys())
+                writer.writerow(header)
+            writer.writerow([ioutils_csv_value(row.get(k)) for k in header])
+        elif isinstance(row, list):
+            writer.writerow([ioutils_csv_value(v) for v in row])
+        else:
+            writer.writerow([ioutils_csv_value(row)])
+
+
+def command_ctl_response_print(response, oformat, ostream=None, delimiter=","):
     """Print the rpc control command response
 
     \b
@@ -91,38 +328,56 @@ def command_ctl_response_print(response, oformat):
       - oformat: output format:
         * json: json pretty formating
         * yaml: yaml pretty formating (list like, more compact)
+        * ndjson: one compact json line per item of the result array
+        * csv: one csv line per item of the result array
         * raw output - just print the response
+      - ostream: where to write the output (default: sys.stdout)
+      - delimiter: the delimiter of csv fields
+    The response is not loaded at once - its members are decoded and
+    written out one by one, the output being produced while walking over
+    the response. The raw output is written as received.
     """
-    print()
-    if oformat == "json":
-        print(
-            json.dumps(
-                json.loads(response.decode()), indent=4, separators=(",", ": ")
-            )
+    if ostream is None:
+        ostream = sys.stdout
+    if oformat == "ndjson" or oformat == "csv":
+        rows = command_ctl_response_rows(
+            command_ctl_response_walk(response.decode(), levels=2)
         )
-    elif oformat == "yaml":
-        if iorpc_yaml_format is True:
-            print(
-                yaml.safe_dump(
-                    json.loads(response.decode()), default_flow_style=False
-                )
-            )
+        if oformat == "ndjson":
+            command_ctl_response_print_ndjson(rows, ostream)
         else:
-            print(
-                json.dumps(
-                    json.loads(response.decode()),
-                    indent=4,
-                    separators=(",", ": "),
-                )
-            )
+            command_ctl_response_print_csv(rows, ostream, delimiter)
+        ostream.flush()
+        return
+    ostream.write("\n")
+    if oformat == "json" or oformat == "yaml":
+        events = command_ctl_response_walk(response.decode())
+        if oformat == "yaml" and iorpc_yaml_format is True:
+            command_ctl_response_print_yaml(events, ostream)
+            ostream.write("\n")
+        else:
+            command_ctl_response_print_json(events, ostream)
     else:
-        print(response)
+        obuf = getattr(ostream, "buffer", None)
+        if obuf is None:
+            ostream.write(response.decode(errors="replace") + "\n")
+        else:
+            ostream.flush()
+            obuf.write(response)
+            obuf.write(b"\n")
+    ostream.flush()
 
 
 def command_ctl_response(ctx, response, oformat, cbexec={}):
     """Process a rpc control command response"""
     if not cbexec:
-        command_ctl_response_print(response, oformat)
+        command_ctl_response_print(
+            response,
+            oformat,
+            delimiter=ioutils_csv_delimiter(ctx, "jsonrpc")
+            if oformat == "csv"
+            else ",",
+        )
     else:
         if "func" in cbexec:
             if "params" in cbexec:
@@ -133,46 +388,155 @@ def command_ctl_response(ctx, response, oformat, cbexec={}):
             ctx.log("invalid callback structure - function is missing")
 
 
-class IOFifoThread(threading.Thread):
-    """Thread to listen on a reply fifo file"""
+class IORPCJsonFrame(object):
+    """Incremental detection of the end of a JSON document in a buffer
 
-    def __init__(self, ctx, rplpath, oformat, cbexec={}):
-        threading.Thread.__init__(self)
-        self.ctx = ctx
-        self.rplpath = rplpath
-        self.oformat = oformat
-        self.cbexec = cbexec
-        self.stop_signal = False
-
-    def run(self):
-        self.ctx.vlog("Starting to wait for reply on: " + self.rplpath)
-        r = os.open(self.rplpath, os.O_RDONLY | os.O_NONBLOCK)
-        scount = 0
-        rcount = 0
-        wcount = 0
-        rdata = ""
-        while not self.stop_signal:
-            rbuf = os.read(r, 4096).decode()
-            if rbuf == "":
-                if rcount != 0:
-                    wcount += 1
-                    if wcount == 8:
-                        break
-                    time.sleep(0.100)
-                else:
-                    scount += 1
-                    if scount == 50:
-                        break
-                    time.sleep(0.100)
+    \b
+    The buffer is scanned only for the new data added since previous call,
+    keeping the nesting depth and the string state between calls. Only the
+    structural characters are inspected, using regular expressions.
+    """
+
+    re_value = re.compile(rb'[{}\[\]"]')
+    re_string = re.compile(rb'["\\]')
+
+    def __init__(self):
+        self.pos = 0
+        self.depth = 0
+        self.instr = False
+        self.started = False
+
+    def scan(self, buf):
+        """Return the end offset of the JSON document or -1 if incomplete"""
+        blen = len(buf)
+        while self.pos < blen:
+            if self.instr:
+                m = self.re_string.search(buf, self.pos)
+                if m is None:
+                    self.pos = blen
+                    break
+                if buf[m.start()] == 0x5C:
+                    # skip the escaped char (may be in the next chunk)
+                    self.pos = m.end() + 1
+                    continue
+                self.instr = False
+                self.pos = m.end()
+                continue
+            m = self.re_value.search(buf, self.pos)
+            if m is None:
+                self.pos = blen
+                break
+            self.pos = m.end()
+            c = buf[m.start()]
+            if c == 0x22:
+                self.instr = True
+            elif c == 0x7B or c == 0x5B:
+                self.depth += 1
+                self.started = True
             else:
-                rcount += 1
-                wcount = 0
-                rdata += rbuf
+                self.depth -= 1
+                if self.started and self.depth == 0:
+                    return self.pos
+        return -1
+
+
+def command_jsonrpc_recv_stream(sock, bufsize=65536):
+    """Read from a stream socket until a complete JSON document is received
+
+    \b
+    The data is accumulated in a bytearray, growing in amortized chunks,
+    without limit for the size of the document.
+    """
+    buf = bytearray()
+    frame = IORPCJsonFrame()
+    while True:
+        rbuf = sock.recv(bufsize)
+        if not rbuf:
+            break
+        buf += rbuf
+        end = frame.scan(buf)
+        if end >= 0:
+            del buf[end:]
+            break
+    return bytes(buf)
+
+
+def command_jsonrpc_fifo_read(ctx, rfd, timeout=5.0):
+    """Read the response from reply fifo until the JSON document is complete
+
+    \b
+    Parameters:
+      - ctx: kamcli execution context
+      - rfd: file descriptor of reply fifo, opened in non-blocking mode
+      - timeout: max time (seconds) to wait for new data
+    The data is accumulated in a bytearray and it is returned as soon as the
+    JSON document is complete or the writer closes the fifo.
+    """
+    rpoll = select.poll()
+    rpoll.register(rfd, select.POLLIN)
+    buf = bytearray()
+    frame = IORPCJsonFrame()
+    while True:
+        if not rpoll.poll(timeout * 1000):
+            ctx.vlog("timeout waiting for data on reply fifo")
+            break
+        try:
+            rbuf = os.read(rfd, 65536)
+        except BlockingIOError:
+            continue
+        if not rbuf:
+            break
+        buf += rbuf
+        end = frame.scan(buf)
+        if end >= 0:
+            del buf[end:]
+            break
+    return bytes(buf)
+
+
+def command_jsonrpc_param(p):
+    """Return the JSON value for a parameter of a rpc command
+
+    \b
+    By default a parameter is a string value, unless it is a number or its
+    value is prefixed with 'i:' (integer value) or 's:' (string value).
+    """
+    if isinstance(p, (int, float)):
+        return p
+    if p.startswith("i:"):
+        try:
+            return int(p[2:])
+        except ValueError:
+            try:
+                return float(p[2:])
+            except ValueError:
+                return p[2:]
+    if p.startswith("s:"):
+        return p[2:]
+    return p
+
+
+def command_jsonrpc_request(cmd, params, rid, rcvname=None, storepath=None):
+    """Return the dictionary with the JSONRPC request for a rpc command"""
+    rdata = {"jsonrpc": "2.0", "method": cmd}
+    if params:
+        rdata["params"] = [command_jsonrpc_param(p) for p in params]
+    if rcvname is not None:
+        rdata["reply_name"] = rcvname
+    if storepath:
+        rdata["store_path"] = storepath
+    rdata["id"] = rid
+    return rdata
 
-        if rcount == 0:
-            self.ctx.vlog("timeout - nothing read")
-        else:
-            command_ctl_response(self.ctx, rdata, self.oformat, self.cbexec)
+
+def command_jsonrpc_encode(rdata):
+    """Encode a JSONRPC request (or a list of them for batch) to bytes
+
+    \b
+    Compact JSON with proper escaping of string values, ending with a new
+    line, shared by fifo, socket, batch and asyncio transports.
+    """
+    return iojson_dumpb(rdata) + b"\n"
 
 
 ##
@@ -195,37 +559,20 @@ def command_jsonrpc_fifo(
     params=[],
     cbexec={},
 ):
-    scmd = '{\n  "jsonrpc": "2.0",\n  "method": "' + cmd + '",\n'
-    if params:
-        scmd += '  "params": ['
-        comma = 0
-        for p in params:
-            if comma == 1:
-                scmd += ",\n"
-            else:
-                comma = 1
-            if type(p) is int:
-                scmd += str(p)
-            elif type(p) is float:
-                scmd += str(p)
-            else:
-                if p.startswith("i:"):
-                    scmd += p[2:]
-                elif p.startswith("s:"):
-                    scmd += '"' + p[2:] + '"'
-                else:
-                    scmd += '"' + p + '"'
-        scmd += "],\n"
-
-    scmd += '  "reply_name": "' + rcvname + '",\n'
-    if storepath and len(storepath) > 0:
-        scmd += '  "store_path": "' + storepath + '",\n'
-    scmd += '  "id": ' + str(randint(2, 10000)) + "\n"
-    scmd += "}\n"
+    scmd = command_jsonrpc_encode(
+        command_jsonrpc_request(
+            cmd, params, randint(2, 10000), rcvname, storepath
+        )
+    )
     if dryrun:
-        print(json.dumps(json.loads(scmd), indent=4, separators=(",", ": ")))
+        print(iojson_dumps(iojson_loads(scmd), pretty=True))
         return
 
+    command_jsonrpc_fifo_exec(ctx, sndpath, rcvname, oformat, scmd, cbexec)
+
+
+def command_jsonrpc_fifo_exec(ctx, sndpath, rcvname, oformat, scmd, cbexec={}):
+    """Write the request to kamailio fifo and process the reply fifo data"""
     rcvpath = ctx.gconfig.get("jsonrpc", "rpldir") + "/" + rcvname
     if os.path.exists(rcvpath):
         if stat.S_ISFIFO(os.stat(rcvpath).st_mode):
@@ -240,26 +587,151 @@ def command_jsonrpc_fifo(
         shutil.chown(rcvpath, group=ctx.gconfig.get("jsonrpc", "kamgroup"))
     except NoOptionError:
         pass
-    # create new thread to read from reply fifo
-    tiofifo = IOFifoThread(ctx, rcvpath, oformat)
-    # start new threadd
-    tiofifo.start()
+    # open reply fifo before sending the request to be ready for response
+    ctx.vlog("Starting to wait for reply on: " + rcvpath)
+    r = os.open(rcvpath, os.O_RDONLY | os.O_NONBLOCK)
+    response = b""
+    try:
+        w = os.open(sndpath, os.O_WRONLY)
+        os.write(w, scmd)
+        os.close(w)
+        response = command_jsonrpc_fifo_read(ctx, r)
+    except KeyboardInterrupt:
+        ctx.log("Ctrl-c received! Stopping to wait for reply...")
+    finally:
+        os.close(r)
+        os.unlink(rcvpath)
+
+    if not response:
+        ctx.vlog("timeout - nothing read")
+    else:
+        command_ctl_response(ctx, response, oformat, cbexec)
+
 
-    w = os.open(sndpath, os.O_WRONLY)
-    os.write(w, scmd.encode())
+class IORPCTruncatedError(Exception):
+    """Datagram response larger than the receive buffer"""
+
+    pass
+
+
+class IORPCSocket(object):
+    """Client socket reused for the JSONRPC commands sent to kamailio"""
+
+    def __init__(self, ctx, srvaddr, rcvaddr):
+        self.ctx = ctx
+        self.srvaddr = srvaddr
+        self.rcvaddr = rcvaddr
+        self.proto = "unix"
+        self.saddr = srvaddr
+        self.rcvpath = None
+        self.sock = None
+        self.connected = False
+        self.rcvbufsize = ctx.gconfig.getint(
+            "jsonrpc", "rcvbufsize", fallback=84000
+        )
+
+    def open(self):
+        """Create the socket and bind the unix reply address if needed"""
+        if self.srvaddr.startswith("udp:") or self.srvaddr.startswith("tcp:"):
+            self.proto, saddr = self.srvaddr.split(":", 1)
+            self.ctx.vlog(self.proto + " socket provided: " + self.srvaddr)
+            if saddr.find("[", 0, 2) == -1:
+                self.ctx.vlog("IPv4 socket address")
+                host, port = saddr.split(":")
+                family = socket.AF_INET
+            else:
+                self.ctx.vlog("IPv6 socket address")
+                ehost, port = saddr.rsplit(":", 1)
+                host = ehost.strip("[]")
+                family = socket.AF_INET6
+            self.saddr = (host, int(port))
+            if self.proto == "udp":
+                self.sock = socket.socket(family, socket.SOCK_DGRAM)
+                self.sock.setsockopt(
+                    socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbufsize
+                )
+            else:
+                self.sock = socket.socket(family, socket.SOCK_STREAM)
+            self.sock.settimeout(4.0)
+            return
 
-    waitrun = True
-    while waitrun:
+        self.ctx.vlog("unix socket provided: " + self.srvaddr)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.setsockopt(
+            socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbufsize
+        )
+        self.sock.settimeout(4.0)
+        self.rcvpath = self.rcvaddr + "." + str(os.getpid())
+        self.ctx.vlog("unix socket reply: " + self.rcvpath)
+        self.sock.bind(self.rcvpath)
+        os.chmod(self.rcvpath, 0o666)
         try:
-            tiofifo.join(500)
-            if not tiofifo.is_alive():
-                waitrun = False
-                break
-        except KeyboardInterrupt:
-            ctx.log("Ctrl-c received! Sending kill to threads...")
-            tiofifo.stop_signal = True
+            shutil.chown(
+                self.rcvpath, group=self.ctx.gconfig.get("jsonrpc", "kamgroup")
+            )
+        except NoOptionError:
+            pass
+
+    def request(self, data):
+        """Send the request data and return the response"""
+        if self.sock is None:
+            self.open()
+        if self.proto == "tcp":
+            reused = self.connected
+            try:
+                if not self.connected:
+                    self.sock.connect(self.saddr)
+                    self.connected = True
+                self.sock.sendall(data)
+                response = command_jsonrpc_recv_stream(self.sock)
+            except ConnectionError:
+                if not reused:
+                    raise
+                response = b""
+            if not response and reused:
+                # server closed the connection used for a previous request
+                self.ctx.vlog("reconnecting to: " + self.srvaddr)
+                self.close()
+                return self.request(data)
+            return response
+        self.sock.sendto(data, self.saddr)
+        response, ancdata, flags, addr = self.sock.recvmsg(self.rcvbufsize)
+        if flags & socket.MSG_TRUNC:
+            raise IORPCTruncatedError(
+                "response larger than " + str(self.rcvbufsize) + " bytes"
+            )
+        return response
+
+    def close(self):
+        """Close the socket and remove the unix reply address"""
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self.connected = False
+        if self.rcvpath is not None:
+            if os.path.exists(self.rcvpath):
+                os.remove(self.rcvpath)
+            self.rcvpath = None
+
+
+def command_jsonrpc_socket_conn(ctx, srvaddr, rcvaddr, connattr="rpcconn"):
+    """Return the socket connection kept in context, creating it if needed
 
-    os.unlink(rcvpath)
+    \b
+    The socket is opened on first request and reused for all the JSONRPC
+    commands executed by the process, being closed at exit. The connection
+    of the fallback transport is kept in a different context attribute
+    (connattr), not replacing the main one.
+    """
+    conn = getattr(ctx, connattr)
+    if conn is not None:
+        if conn.srvaddr == srvaddr and conn.rcvaddr == rcvaddr:
+            return conn
+        conn.close()
+    conn = IORPCSocket(ctx, srvaddr, rcvaddr)
+    atexit.register(conn.close)
+    setattr(ctx, connattr, conn)
+    return conn
 
 
 ##
@@ -280,157 +752,318 @@ def command_jsonrpc_socket(
     cmd,
     params=[],
     cbexec={},
+    connattr="rpcconn",
 ):
-    scmd = '{\n  "jsonrpc": "2.0",\n  "method": "' + cmd + '",\n'
-    if params:
-        scmd += '  "params": ['
-        comma = 0
-        for p in params:
-            if comma == 1:
-                scmd += ",\n"
-            else:
-                comma = 1
-            if type(p) in [int, float]:
-                scmd += str(p)
-            else:
-                if p.startswith("i:"):
-                    scmd += p[2:]
-                elif p.startswith("s:"):
-                    scmd += '"' + p[2:] + '"'
-                else:
-                    scmd += '"' + p + '"'
-        scmd += "],\n"
-
-    if storepath and len(storepath) > 0:
-        scmd += '  "store_path": "' + storepath + '",\n'
-
-    scmd += '  "id": ' + str(randint(2, 10000)) + "\n"
-    scmd += "}\n"
+    scmd = command_jsonrpc_encode(
+        command_jsonrpc_request(
+            cmd, params, randint(2, 10000), None, storepath
+        )
+    )
     if dryrun:
-        print(json.dumps(json.loads(scmd), indent=4, separators=(",", ": ")))
+        print(iojson_dumps(iojson_loads(scmd), pretty=True))
         return
 
-    sockclient = None
+    if not srvaddr.startswith("udp:") and not srvaddr.startswith("tcp:"):
+        if not os.path.exists(srvaddr):
+            ctx.vlog("server unix socket file not found")
+            ctx.vlog(
+                "be sure kamailio is running and listening on: " + srvaddr
+            )
+            return
+
+    conn = command_jsonrpc_socket_conn(ctx, srvaddr, rcvaddr, connattr)
     response = None
-    socktype = "IPv4"
-    host = None
-    port = None
-    if srvaddr.startswith("udp:"):
-        ctx.vlog("udp socket provided: " + srvaddr)
-        sproto, saddr = srvaddr.split(":", 1)
-        if saddr.find("[", 0, 2) == -1:
-            ctx.vlog("IPv4 socket address")
-            host, port = saddr.split(":")
-        else:
-            ctx.vlog("IPv6 socket address")
-            ehost, port = saddr.rsplit(":", 1)
-            host = ehost.strip("[]")
-            socktype = "IPv6"
+    try:
+        response = conn.request(scmd)
+        if ctx.debug:
+            ctx.vlog("Server response: " + response.decode())
+    except IORPCTruncatedError as emsg:
+        ctx.vlog("Truncated " + conn.proto + " response: " + str(emsg))
+        command_jsonrpc_fallback(
+            ctx, srvaddr, rcvaddr, oformat, cmd, params, cbexec
+        )
+        return
+    except socket.timeout:
+        ctx.log("Timeout receiving response on " + conn.proto + " socket")
+        conn.close()
+        sys.exit()
+    except socket.error as emsg:
+        ctx.log("Error " + conn.proto + " sock: " + str(emsg))
+        conn.close()
+        sys.exit()
 
-        # create datagram udp socket
-        try:
-            if socktype == "IPv6":
-                sockclient = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
-            else:
-                sockclient = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    if response is None:
+        ctx.vlog("timeout - nothing read")
+    else:
+        command_ctl_response(ctx, response, oformat, cbexec)
 
-            sockclient.settimeout(4.0)
-            sockclient.sendto(scmd.encode(), (host, int(port)))
 
-            # receive the response (content, sockserver)
-            data = sockclient.recvfrom(84000)
-            response = data[0]
-            # sockserver = data[1]
+##
+# [
+#   {"jsonrpc": "2.0", "method": "command1", "params": [p1], "id": 1},
+#   {"jsonrpc": "2.0", "method": "command2", "params": [p2], "id": 2}
+# ]
+def command_jsonrpc_batch(cmds, rcvname=None):
+    """Return the batch request and the list of ids for the commands
 
-            ctx.vlog("Server response: " + response.decode())
+    \b
+    Parameters:
+      - cmds: list of [cmd, params] items
+      - rcvname: reply fifo name to be added in the requests (fifo only)
+    """
+    rid = randint(2, 10000)
+    rids = list(range(rid, rid + len(cmds)))
+    rdata = [
+        command_jsonrpc_request(c[0], c[1], i, rcvname)
+        for c, i in zip(cmds, rids)
+    ]
+    return command_jsonrpc_encode(rdata), rids
 
-        except socket.timeout:
-            ctx.log("Timeout receiving response on udp socket")
-            sys.exit()
-        except socket.error as emsg:
-            ctx.log("Error udp sock: " + str(emsg[0]) + " - " + emsg[1])
-            sys.exit()
-    elif srvaddr.startswith("tcp:"):
-        ctx.vlog("tcp socket provided: " + srvaddr)
-        sproto, saddr = srvaddr.split(":", 1)
-        if saddr.find("[", 0, 2) == -1:
-            ctx.vlog("IPv4 socket address")
-            host, port = saddr.split(":")
+
+def command_ctl_readonly_split(ctx, reason, cmds):
+    """Return the commands reading data, log the ones that change the state
+
+    \b
+    Used for the commands of a batch request that may have been executed
+    by kamailio, only the ones reading data can be executed again.
+    """
+    rwcmds = [c for c in cmds if not command_ctl_readonly(c[0])]
+    if rwcmds:
+        ctx.log(
+            reason
+            + " - not executed again as they may change the state: "
+            + ", ".join(c[0] + " " + iojson_dumps(c[1]) for c in rwcmds)
+        )
+    return [c for c in cmds if command_ctl_readonly(c[0])]
+
+
+def command_ctl_batch_fallback(ctx, reason, cmds, cbexec={}):
+    """Execute the commands of a batch request one by one
+
+    \b
+    Used when the reply of kamailio to the batch request is not an array.
+    Batch requests are not used anymore by the process.
+    """
+    ctx.log(reason + " - sending commands one by one")
+    ctx.rpcbatch = False
+    for c in cmds:
+        command_ctl(ctx, c[0], c[1], cbexec)
+
+
+def command_ctl_batch_noreply(ctx, cmds, cbexec={}):
+    """Handle a batch request without reply
+
+    \b
+    Kamailio may have executed the commands, therefore only the ones
+    reading data are sent again, one by one. Batch requests are not used
+    anymore by the process.
+    """
+    ctx.rpcbatch = False
+    rocmds = command_ctl_readonly_split(
+        ctx, "no response to batch request", cmds
+    )
+    if rocmds:
+        ctx.log("no response to batch request - sending commands one by one")
+    for c in rocmds:
+        command_ctl(ctx, c[0], c[1], cbexec)
+
+
+def command_ctl_batch_response(ctx, response, rids, cmds, oformat, cbexec={}):
+    """Split the response of a batch request and process each item by id"""
+    if not response:
+        command_ctl_batch_noreply(ctx, cmds, cbexec)
+        return
+    try:
+        rdata = iojson_loads(response)
+    except ValueError:
+        rdata = None
+    if not isinstance(rdata, list):
+        command_ctl_batch_fallback(
+            ctx, "batch request not supported", cmds, cbexec
+        )
+        return
+    ritems = {}
+    for r in rdata:
+        if isinstance(r, dict) and "id" in r:
+            ritems[r["id"]] = r
+    for rid in rids:
+        if rid in ritems:
+            command_ctl_response(
+                ctx, iojson_dumpb(ritems[rid]), oformat, cbexec
+            )
         else:
-            ctx.vlog("IPv6 socket address")
-            ehost, port = saddr.rsplit(":", 1)
-            host = ehost.strip("[]")
-            socktype = "IPv6"
+            ctx.log("no response for batch command with id " + str(rid))
 
-        # create datagram udp socket
-        try:
-            if socktype == "IPv6":
-                sockclient = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
-            else:
-                sockclient = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
-            sockclient.settimeout(4.0)
-            sockclient.connect((host, int(port)))
-            sockclient.sendall(scmd.encode())
-            # receive the response (content, sockserver)
-            response = sockclient.recv(84000)
+def command_jsonrpc_fifo_batch(
+    ctx, sndpath, rcvname, oformat, cmds, cbexec={}
+):
+    """Execute a list of rpc commands with a batch request via fifo"""
+    scmd, rids = command_jsonrpc_batch(cmds, rcvname)
+    rdata = []
+    command_jsonrpc_fifo_exec(
+        ctx,
+        sndpath,
+        rcvname,
+        oformat,
+        scmd,
+        {"func": lambda c, r: rdata.append(r)},
+    )
+    command_ctl_batch_response(
+        ctx, rdata[0] if rdata else None, rids, cmds, oformat, cbexec
+    )
 
-            ctx.vlog("Server response: " + response.decode())
 
-        except socket.timeout:
-            ctx.log("Timeout receiving response on tcp socket")
-            sys.exit()
-        except socket.error as emsg:
-            ctx.log("Error tcp sock: " + str(emsg[0]) + " - " + emsg[1])
-            sys.exit()
-    else:
-        ctx.vlog("unix socket provided: " + srvaddr)
+def command_jsonrpc_socket_batch(
+    ctx, srvaddr, rcvaddr, oformat, cmds, cbexec={}, connattr="rpcconn"
+):
+    """Execute a list of rpc commands with a batch request via socket"""
+    scmd, rids = command_jsonrpc_batch(cmds)
+    if not srvaddr.startswith("udp:") and not srvaddr.startswith("tcp:"):
         if not os.path.exists(srvaddr):
             ctx.vlog("server unix socket file not found")
-            ctx.vlog(
-                "be sure kamailio is running and listening on: " + srvaddr
-            )
             return
-        # create datagram udp socket
-        try:
-            sockclient = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
-            sockclient.settimeout(4.0)
-            rcvaddr = rcvaddr + "." + str(os.getpid())
-            ctx.vlog("unix socket reply: " + rcvaddr)
-            sockclient.bind(rcvaddr)
-            os.chmod(rcvaddr, 0o666)
-            try:
-                shutil.chown(
-                    rcvaddr, group=ctx.gconfig.get("jsonrpc", "kamgroup")
-                )
-            except NoOptionError:
-                pass
-            # sockclient.connect( srvaddr )
-            # sockclient.send( scmd )
-            sockclient.sendto(scmd.encode(), srvaddr)
 
-            # receive the response (content, sockserver)
-            response = sockclient.recv(84000)
-            sockclient.close()
-            os.remove(rcvaddr)
+    conn = command_jsonrpc_socket_conn(ctx, srvaddr, rcvaddr, connattr)
+    try:
+        response = conn.request(scmd)
+    except IORPCTruncatedError as emsg:
+        ctx.vlog("Truncated " + conn.proto + " response: " + str(emsg))
+        command_jsonrpc_fallback_batch(
+            ctx, srvaddr, rcvaddr, oformat, cmds, cbexec
+        )
+        return
+    except socket.timeout:
+        ctx.vlog("Timeout receiving response on " + conn.proto + " socket")
+        conn.close()
+        response = None
+    except socket.error as emsg:
+        ctx.log("Error " + conn.proto + " sock: " + str(emsg))
+        conn.close()
+        sys.exit()
+    command_ctl_batch_response(ctx, response, rids, cmds, oformat, cbexec)
 
-            ctx.vlog("Server response: " + response.decode())
 
-        except socket.timeout:
-            ctx.log("Timeout receiving response on unix sock")
-            sockclient.close()
-            os.remove(rcvaddr)
-            sys.exit()
-        except socket.error as emsg:
-            ctx.log("Error unix sock: " + str(emsg[0]) + " - " + emsg[1])
-            sockclient.close()
-            os.remove(rcvaddr)
-            sys.exit()
+def command_jsonrpc_fallback_batch(
+    ctx, srvaddr, rcvaddr, oformat, cmds, cbexec={}
+):
+    """Execute again the commands of a batch whose response was truncated
 
-    if response is None:
-        ctx.vlog("timeout - nothing read")
+    \b
+    Only the commands reading data are executed again, with one batch
+    request over the fallback transport (see command_jsonrpc_fallback()),
+    an error being logged for the others. For store fallback, the commands
+    are executed one by one.
+    """
+    fallback = ctx.gconfig.get("jsonrpc", "fallback", fallback="none")
+    if fallback == "none":
+        ctx.log(
+            "Response too large - increase rcvbufsize or set fallback"
+            " in jsonrpc config section"
+        )
+        return
+    rocmds = command_ctl_readonly_split(
+        ctx, "Response too large for batch request", cmds
+    )
+    if not rocmds:
+        return
+    if fallback.startswith("tcp:"):
+        ctx.vlog("retrying the commands over: " + fallback)
+        command_jsonrpc_socket_batch(
+            ctx, fallback, rcvaddr, oformat, rocmds, cbexec, "rpcfbconn"
+        )
+    elif fallback == "fifo":
+        ctx.vlog("retrying the commands over fifo")
+        command_jsonrpc_fifo_batch(
+            ctx,
+            ctx.gconfig.get("jsonrpc", "path"),
+            ctx.gconfig.get("jsonrpc", "rplnamebase"),
+            oformat,
+            rocmds,
+            cbexec,
+        )
     else:
+        for c in rocmds:
+            command_jsonrpc_fallback(
+                ctx, srvaddr, rcvaddr, oformat, c[0], c[1], cbexec
+            )
+
+
+def command_jsonrpc_fallback(
+    ctx, srvaddr, rcvaddr, oformat, cmd, params=[], cbexec={}
+):
+    """Execute again a rpc command whose datagram response was truncated
+
+    \b
+    The transport is selected by 'fallback' attribute (jsonrpc section):
+      - tcp:ipaddr:port - send the command over tcp
+      - fifo - send the command over the fifo file
+      - store:/path/to/file - send the command with store_path, then read
+        the response from the file written by kamailio
+    Kamailio has already executed the command, therefore only the commands
+    reading data are executed again.
+    """
+    fallback = ctx.gconfig.get("jsonrpc", "fallback", fallback="none")
+    if fallback != "none" and not command_ctl_readonly(cmd):
+        ctx.log(
+            "Response too large for command " + cmd + " - not executed"
+            " again as it may change the state, increase rcvbufsize"
+            " in jsonrpc config section"
+        )
+        return
+    if fallback.startswith("tcp:"):
+        ctx.vlog("retrying the command over: " + fallback)
+        command_jsonrpc_socket(
+            ctx,
+            False,
+            fallback,
+            rcvaddr,
+            oformat,
+            "",
+            cmd,
+            params,
+            cbexec,
+            "rpcfbconn",
+        )
+    elif fallback == "fifo":
+        ctx.vlog("retrying the command over fifo")
+        command_jsonrpc_fifo(
+            ctx,
+            False,
+            ctx.gconfig.get("jsonrpc", "path"),
+            ctx.gconfig.get("jsonrpc", "rplnamebase"),
+            oformat,
+            "",
+            cmd,
+            params,
+            cbexec,
+        )
+    elif fallback.startswith("store:"):
+        storepath = fallback[6:] + "." + str(os.getpid())
+        ctx.vlog("retrying the command with store path: " + storepath)
+        command_jsonrpc_socket(
+            ctx,
+            False,
+            srvaddr,
+            rcvaddr,
+            oformat,
+            storepath,
+            cmd,
+            params,
+            {"func": lambda c, r: None},
+        )
+        if not os.path.exists(storepath):
+            ctx.log("Response not stored in file: " + storepath)
+            return
+        with open(storepath, "rb") as f:
+            response = f.read()
+        os.remove(storepath)
         command_ctl_response(ctx, response, oformat, cbexec)
+    else:
+        ctx.log(
+            "Response too large - increase rcvbufsize or set fallback"
+            " in jsonrpc config section"
+        )
 
 
 def command_ctl(ctx, cmd, params=[], cbexec={}):
@@ -473,3 +1106,54 @@ def command_ctl(ctx, cmd, params=[], cbexec={}):
             params,
             cbexec,
         )
+
+
+def command_ctl_batch(ctx, cmds, cbexec={}):
+    """Execute a list of rpc control commands using batch requests
+
+    \b
+    Parameters:
+      - ctx: kamcli execution context
+      - cmds: list of [cmd, params] items, cmd being the rpc control command
+              and params the array with its parameters
+      - cbexec: dictionary with callaback function and its parameters, used
+                for the response of each rpc control command (see
+                command_ctl())
+    The commands are packed in JSONRPC batch requests of at most 'batchsize'
+    items (jsonrpc config section, default 1 - no batch requests). If
+    kamailio does not support batch requests, the commands are executed one
+    by one.
+    """
+    bsize = ctx.gconfig.getint("jsonrpc", "batchsize", fallback=1)
+    if bsize <= 1 or len(cmds) <= 1 or not ctx.rpcbatch:
+        for c in cmds:
+            command_ctl(ctx, c[0], c[1], cbexec)
+        return
+
+    oformat = ctx.gconfig.get("jsonrpc", "outformat")
+    for i in range(0, len(cmds), bsize):
+        if not ctx.rpcbatch:
+            for c in cmds[i:]:
+                command_ctl(ctx, c[0], c[1], cbexec)
+            return
+        bcmds = [
+            [command_ctl_name(c[0], "rpc"), c[1]] for c in cmds[i : i + bsize]
+        ]
+        if ctx.gconfig.get("jsonrpc", "transport") == "socket":
+            command_jsonrpc_socket_batch(
+                ctx,
+                ctx.gconfig.get("jsonrpc", "srvaddr"),
+                ctx.gconfig.get("jsonrpc", "rcvaddr"),
+                oformat,
+                bcmds,
+                cbexec,
+            )
+        else:
+            command_jsonrpc_fifo_batch(
+                ctx,
+                ctx.gconfig.get("jsonrpc", "path"),
+                ctx.gconfig.get("jsonrpc", "rplnamebase"),
+                oformat,
+                bcmds,
+                cbexec,
+            )
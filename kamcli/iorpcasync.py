@@ -0,0 +1,244 @@
+import os
+import re
+import sys
+import shutil
+import socket
+import asyncio
+from random import randint
+from configparser import NoOptionError
+from kamcli.iorpc import command_ctl
+from kamcli.iorpc import command_ctl_name
+from kamcli.iorpc import command_ctl_response
+from kamcli.iorpc import IORPCJsonFrame
+from kamcli.iorpc import command_jsonrpc_encode
+from kamcli.iorpc import command_jsonrpc_request
+from kamcli.iojson import iojson_loads
+
+##
+# match the id at the end of a JSONRPC response
+IORPCASYNC_ID_RE = re.compile(rb'"id"\s*:\s*(\d+)\s*}\s*$')
+
+
+def iorpcasync_response_id(response):
+    """Return the id of a JSONRPC response (None if not found)"""
+    m = IORPCASYNC_ID_RE.search(response[-64:])
+    if m is not None:
+        return int(m.group(1))
+    try:
+        rdata = iojson_loads(response)
+    except ValueError:
+        return None
+    if isinstance(rdata, dict):
+        return rdata.get("id", None)
+    return None
+
+
+class IORPCAsyncDgram(asyncio.DatagramProtocol):
+    """Datagram protocol matching the JSONRPC responses by id"""
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.pending = {}
+
+    def datagram_received(self, data, addr):
+        rid = iorpcasync_response_id(data)
+        fut = self.pending.pop(rid, None)
+        if fut is None:
+            self.ctx.vlog("discarding response with unknown id: " + str(rid))
+        elif not fut.done():
+            fut.set_result(data)
+
+    def error_received(self, exc):
+        self.ctx.vlog("datagram socket error: " + str(exc))
+
+
+class IORPCAsyncClient(object):
+    """Asyncio JSONRPC client keeping many requests in flight
+
+    \b
+    For unix and udp sockets, all requests are sent over the same socket
+    and the responses are matched by id. For tcp, each request in flight
+    uses its own connection. The number of requests waiting for response
+    at the same time is limited by the inflight attribute.
+    """
+
+    def __init__(self, ctx, srvaddr, rcvaddr, inflight, timeout=4.0):
+        self.ctx = ctx
+        self.srvaddr = srvaddr
+        self.rcvaddr = rcvaddr
+        self.inflight = inflight
+        self.timeout = timeout
+        self.proto = "unix"
+        self.saddr = srvaddr
+        self.rcvpath = None
+        self.transport = None
+        self.dgram = None
+        self.sem = None
+
+    def parse_srvaddr(self):
+        sproto, saddr = self.srvaddr.split(":", 1)
+        self.proto = sproto
+        if saddr.find("[", 0, 2) == -1:
+            host, port = saddr.split(":")
+            return socket.AF_INET, (host, int(port))
+        ehost, port = saddr.rsplit(":", 1)
+        return socket.AF_INET6, (ehost.strip("[]"), int(port))
+
+    async def open(self):
+        """Create the datagram endpoint (unix and udp sockets)"""
+        self.sem = asyncio.Semaphore(self.inflight)
+        if self.srvaddr.startswith("tcp:"):
+            family, self.saddr = self.parse_srvaddr()
+            return
+        if self.srvaddr.startswith("udp:"):
+            family, self.saddr = self.parse_srvaddr()
+            sock = socket.socket(family, socket.SOCK_DGRAM)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.rcvpath = self.rcvaddr + "." + str(os.getpid()) + "a"
+            self.ctx.vlog("unix socket reply: " + self.rcvpath)
+            sock.bind(self.rcvpath)
+            os.chmod(self.rcvpath, 0o666)
+            try:
+                shutil.chown(
+                    self.rcvpath,
+                    group=self.ctx.gconfig.get("jsonrpc", "kamgroup"),
+                )
+            except NoOptionError:
+                pass
+        sock.setblocking(False)
+        loop = asyncio.get_event_loop()
+        self.transport, self.dgram = await loop.create_datagram_endpoint(
+            lambda: IORPCAsyncDgram(self.ctx), sock=sock
+        )
+
+    async def request_dgram(self, rid, data):
+        fut = asyncio.get_event_loop().create_future()
+        self.dgram.pending[rid] = fut
+        self.transport.sendto(data, self.saddr)
+        try:
+            return await asyncio.wait_for(fut, self.timeout)
+        finally:
+            self.dgram.pending.pop(rid, None)
+
+    async def request_tcp(self, rid, data):
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.saddr[0], self.saddr[1]),
+            self.timeout,
+        )
+        try:
+            writer.write(data)
+            await writer.drain()
+            buf = bytearray()
+            frame = IORPCJsonFrame()
+            while True:
+                rbuf = await asyncio.wait_for(reader.read(65536), self.timeout)
+                if not rbuf:
+                    break
+                buf += rbuf
+                end = frame.scan(buf)
+                if end >= 0:
+                    del buf[end:]
+                    break
+            return bytes(buf)
+        finally:
+            writer.close()
+
+    async def request(self, rid, data):
+        """Send the request once a slot is free and return the response"""
+        async with self.sem:
+            try:
+                if self.proto == "tcp":
+                    return await self.request_tcp(rid, data)
+                return await self.request_dgram(rid, data)
+            except asyncio.TimeoutError:
+                self.ctx.log(
+                    "Timeout receiving response for command id " + str(rid)
+                )
+            except OSError as emsg:
+                self.ctx.log("Error " + self.proto + " sock: " + str(emsg))
+            return None
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+        if self.rcvpath is not None:
+            if os.path.exists(self.rcvpath):
+                os.remove(self.rcvpath)
+            self.rcvpath = None
+
+
+async def command_jsonrpc_async(ctx, srvaddr, rcvaddr, inflight, cmds):
+    """Send the list of rpc commands and return the list of responses"""
+    client = IORPCAsyncClient(ctx, srvaddr, rcvaddr, inflight)
+    await client.open()
+    rid = randint(2, 10000)
+    tasks = []
+    try:
+        for c in cmds:
+            scmd = command_jsonrpc_encode(
+                command_jsonrpc_request(c[0], c[1], rid)
+            )
+            tasks.append(client.request(rid, scmd))
+            rid += 1
+        return await asyncio.gather(*tasks)
+    finally:
+        client.close()
+
+
+def command_ctl_async(ctx, cmds, cbexec={}):
+    """Execute a list of rpc control commands with many of them in flight
+
+    \b
+    Parameters:
+      - ctx: kamcli execution context
+      - cmds: list of [cmd, params] items, cmd being the rpc control command
+              and params the array with its parameters
+      - cbexec: dictionary with callaback function and its parameters, used
+                for the response of each rpc control command (see
+                command_ctl())
+    The number of commands waiting for response at the same time is given
+    by 'inflight' attribute (jsonrpc config section). The responses are
+    processed in the order of the commands. For fifo transport, the commands
+    are executed one by one.
+    """
+    if ctx.gconfig.get("jsonrpc", "transport") != "socket":
+        for c in cmds:
+            command_ctl(ctx, c[0], c[1], cbexec)
+        return
+
+    srvaddr = ctx.gconfig.get("jsonrpc", "srvaddr")
+    if not srvaddr.startswith("udp:") and not srvaddr.startswith("tcp:"):
+        if not os.path.exists(srvaddr):
+            ctx.vlog("server unix socket file not found")
+            ctx.vlog(
+                "be sure kamailio is running and listening on: " + srvaddr
+            )
+            return
+
+    inflight = ctx.gconfig.getint("jsonrpc", "inflight", fallback=16)
+    if inflight < 1:
+        inflight = 1
+    oformat = ctx.gconfig.get("jsonrpc", "outformat")
+    acmds = [[command_ctl_name(c[0], "rpc"), c[1]] for c in cmds]
+    loop = asyncio.new_event_loop()
+    try:
+        responses = loop.run_until_complete(
+            command_jsonrpc_async(
+                ctx,
+                srvaddr,
+                ctx.gconfig.get("jsonrpc", "rcvaddr"),
+                inflight,
+                acmds,
+            )
+        )
+    except KeyboardInterrupt:
+        ctx.log("Ctrl-c received! Stopping the commands execution...")
+        sys.exit()
+    finally:
+        loop.close()
+
+    for response in responses:
+        if response is not None:
+            command_ctl_response(ctx, response, oformat, cbexec)
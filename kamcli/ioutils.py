@@ -1,26 +1,272 @@
 import sys
-import json
+import csv
+import importlib.util
+from kamcli.iojson import iojson_dumps
 
 # import pprint
 
-ioutils_tabulate_format = True
-try:
-    from tabulate import tabulate
-except ImportError:
-    ioutils_tabulate_format = False
-    pass  # module doesn't exist, deal with it.
+##
+# enable table and yaml output formats if the libs can be found (they are
+# loaded when used)
+ioutils_tabulate_format = importlib.util.find_spec("tabulate") is not None
+ioutils_yaml_format = importlib.util.find_spec("yaml") is not None
+
+
+ioutils_formats_list = [
+    "raw",
+    "json",
+    "table",
+    "dict",
+    "yaml",
+    "ndjson",
+    "csv",
+]
 
 ##
-# enable yaml output format if the lib can be loaded
-ioutils_yaml_format = True
-try:
-    import yaml
-except ImportError:
-    ioutils_yaml_format = False
-    pass  # yaml module doesn't exist, deal with it.
+# table styles printed while fetching the rows (see ioutils_table_print())
+ioutils_table_styles = ["grid", "psql", "simple"]
+
+
+def ioutils_csv_delimiter(ctx, section="db"):
+    """Return the delimiter of csv output format (csvdelimiter attribute)
+
+    \b
+    The value can be a single character or one of the names: tab, space,
+    comma, semicolon and pipe (default: comma).
+    """
+    delimiter = ctx.gconfig.get(section, "csvdelimiter", fallback=",")
+    delimiter = {
+        "tab": "\t",
+        "\\t": "\t",
+        "space": " ",
+        "comma": ",",
+        "semicolon": ";",
+        "pipe": "|",
+    }.get(delimiter.lower(), delimiter)
+    if len(delimiter) != 1:
+        ctx.log("invalid csv delimiter: " + delimiter)
+        sys.exit()
+    return delimiter
+
+
+def ioutils_csv_value(value):
+    """Return the value to be written in a csv field
+
+    \b
+    The arrays and objects are written as compact JSON, the other values
+    as their str() (None being an empty field).
+    """
+    if isinstance(value, (dict, list)):
+        return iojson_dumps(value)
+    if isinstance(value, bytes):
+        return value.decode(errors="replace")
+    return value
+
+
+def ioutils_dbrows_write(ostream, oformat, rows, delimiter=","):
+    """Write a list of database rows in ndjson or csv format to ostream"""
+    if oformat == "ndjson":
+        ostream.write("".join(iojson_dumps(dict(r)) + "\n" for r in rows))
+    else:
+        writer = csv.writer(ostream, delimiter=delimiter, lineterminator="\n")
+        writer.writerows([ioutils_csv_value(v) for v in r] for r in rows)
+
+
+def ioutils_file_open(fpath, mode="rt"):
+    """Open a file, compressed if the name ends in .gz, .bz2 or .xz
+
+    \b
+    The text modes use utf-8 encoding and no translation of new lines.
+    """
+    kwargs = {}
+    if "b" not in mode:
+        kwargs = {"encoding": "utf-8", "newline": ""}
+    if fpath.endswith(".gz"):
+        import gzip
+
+        return gzip.open(fpath, mode, **kwargs)
+    if fpath.endswith(".bz2"):
+        import bz2
+
+        return bz2.open(fpath, mode, **kwargs)
+    if fpath.endswith(".xz"):
+        import lzma
+
+        return lzma.open(fpath, mode, **kwargs)
+    return open(fpath, mode, **kwargs)
+
+
+class IOUtilsRow(tuple):
+    """Row of IOUtilsRows, with values accessed by index or column name"""
+
+    fields = ()
+
+    def keys(self):
+        return self.fields
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            key = self.fields.index(key)
+        return tuple.__getitem__(self, key)
+
+
+class IOUtilsRows(object):
+    """Result with rows computed in Python, printable like database results
+
+    \b
+    Provides keys(), fetchmany() and iteration over rows like the database
+    results, to be used with ioutils_dbres_print().
+    """
+
+    def __init__(self, keys, rows):
+        self.fields = tuple(keys)
+        self.rows = iter(rows)
+
+    def keys(self):
+        return list(self.fields)
+
+    def __iter__(self):
+        for r in self.rows:
+            row = IOUtilsRow(r)
+            row.fields = self.fields
+            yield row
+
+    def fetchmany(self, size):
+        rows = []
+        for row in self:
+            rows.append(row)
+            if len(rows) == size:
+                break
+        return rows
+
+
+def ioutils_dbres_batches(ctx, res):
+    """Yield the rows of a database result in lists of fetchsize items
+
+    \b
+    The fetchsize is taken from db config section (default 1000). Together
+    with a server side cursor (see dbutils_roengine()), the memory used for
+    printing the result does not depend on the number of rows.
+    """
+    fetchsize = ctx.gconfig.getint("db", "fetchsize", fallback=1000)
+    if fetchsize < 1:
+        fetchsize = 1000
+    while True:
+        rows = res.fetchmany(fetchsize)
+        if not rows:
+            break
+        yield rows
+
+
+def ioutils_table_widths(ctx):
+    """Return the list of column widths set by tablewidths attribute"""
+    widths = []
+    for w in ctx.gconfig.get("db", "tablewidths", fallback="").split(","):
+        w = w.strip()
+        if not w:
+            widths.append(0)
+            continue
+        try:
+            widths.append(int(w))
+        except ValueError:
+            ctx.log("invalid table column width: " + w)
+            sys.exit()
+    return widths
 
 
-ioutils_formats_list = ["raw", "json", "table", "dict", "yaml"]
+def ioutils_table_cell(value):
+    """Return the text of a table cell (as done by tabulate)"""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return format(value, "g")
+    if isinstance(value, bytes):
+        return value.decode(errors="replace")
+    return str(value)
+
+
+def ioutils_table_print(ctx, ostyle, headers, batches):
+    """Print the rows of a database result as table while fetching them
+
+    \b
+    Parameters:
+      - ctx: kamcli execution context
+      - ostyle: the table style - grid, psql or simple
+      - headers: the list with the names of the columns
+      - batches: iterator over the lists of rows (ioutils_dbres_batches())
+    The widths and the alignment of the columns are computed from the first
+    rows (tablewindow attribute in db section, default 1000), the widths
+    can be also set with tablewidths attribute. The rest of the rows are
+    printed with the same widths as they are fetched, a value longer than
+    its column is printed whole. When all rows fit in the window and no
+    width is set, the table is printed with tabulate.
+    """
+    window = ctx.gconfig.getint("db", "tablewindow", fallback=1000)
+    widths = ioutils_table_widths(ctx)
+    arows = []
+    for rows in batches:
+        arows.extend(tuple(r) for r in rows)
+        if len(arows) > window:
+            break
+    if len(arows) <= window and not any(widths):
+        from tabulate import tabulate
+
+        print(tabulate(arows, headers=headers, tablefmt=ostyle))
+        return
+
+    ncols = len(headers)
+    # tabulate adds min 2 chars of padding to headers
+    cwidths = [len(h) + 2 for h in headers]
+    # numbers are aligned to right
+    numeric = [None] * ncols
+    for row in arows:
+        for i, v in enumerate(row):
+            if v is None:
+                continue
+            if numeric[i] is not False:
+                numeric[i] = isinstance(v, (int, float)) and not isinstance(
+                    v, bool
+                )
+            cwidths[i] = max(cwidths[i], len(ioutils_table_cell(v)))
+    for i, w in enumerate(widths[:ncols]):
+        if w > 0:
+            cwidths[i] = w
+
+    def format_row(row):
+        return [
+            c.rjust(w) if n else c.ljust(w)
+            for c, w, n in zip(map(ioutils_table_cell, row), cwidths, numeric)
+        ]
+
+    if ostyle == "simple":
+        lsep = None
+        lines = [
+            "  ".join(format_row(headers)),
+            "  ".join("-" * w for w in cwidths),
+        ]
+    else:
+        hline = "+" + "+".join("-" * (w + 2) for w in cwidths) + "+"
+        lsep = hline if ostyle == "grid" else None
+        lines = [
+            hline,
+            "| " + " | ".join(format_row(headers)) + " |",
+            "+" + "+".join("=" * (w + 2) for w in cwidths) + "+"
+            if ostyle == "grid"
+            else "|" + "+".join("-" * (w + 2) for w in cwidths) + "|",
+        ]
+    sys.stdout.write("\n".join(lines) + "\n")
+
+    while arows:
+        if ostyle == "simple":
+            lines = ["  ".join(format_row(r)) for r in arows]
+        else:
+            lines = ["| " + " | ".join(format_row(r)) + " |" for r in arows]
+            if lsep is not None:
+                lines = [x for line in lines for x in (line, lsep)]
+        sys.stdout.write("\n".join(lines) + "\n")
+        arows = next(batches, None)
+    if ostyle == "psql":
+        sys.stdout.write(hline + "\n")
 
 
 def ioutils_dbres_print(ctx, oformat, ostyle, res):
@@ -49,31 +295,94 @@ def ioutils_dbres_print(ctx, oformat, ostyle, res):
             ostyle = "grid"
 
     if oformat == "json":
-        jdata = []
-        for row in res:
-            jdata.append(dict(row))
-        print(json.dumps(jdata, indent=4))
-        print()
+        ioutils_dbres_print_json(ctx, res)
+    elif oformat == "ndjson" or oformat == "csv":
+        ioutils_dbres_print_rows(ctx, oformat, res)
     elif oformat == "yaml":
-        ydata = []
-        for row in res:
-            ydata.append(dict(row))
-        print(yaml.dump(ydata, indent=4))
-        print()
+        ioutils_dbres_print_yaml(ctx, res)
     elif oformat == "dict":
-        for row in res:
+        ioutils_dbres_print_dict(ctx, res)
+    elif oformat == "table":
+        ioutils_dbres_print_table(ctx, ostyle, res)
+    else:
+        ioutils_dbres_print_raw(ctx, res)
+
+
+def ioutils_dbres_print_json(ctx, res):
+    """print a database result as a JSON array of objects"""
+    nrows = 0
+    for rows in ioutils_dbres_batches(ctx, res):
+        sys.stdout.write(
+            ("[\n    " if nrows == 0 else ",\n    ")
+            + ",\n    ".join(
+                iojson_dumps(dict(r), pretty=True).replace("\n", "\n    ")
+                for r in rows
+            )
+        )
+        nrows += len(rows)
+    sys.stdout.write("[]\n" if nrows == 0 else "\n]\n")
+    print()
+
+
+def ioutils_dbres_print_rows(ctx, oformat, res):
+    """print a database result one row per line (ndjson or csv)"""
+    delimiter = ","
+    if oformat == "csv":
+        delimiter = ioutils_csv_delimiter(ctx)
+        ioutils_dbrows_write(sys.stdout, oformat, [res.keys()], delimiter)
+    for rows in ioutils_dbres_batches(ctx, res):
+        ioutils_dbrows_write(sys.stdout, oformat, rows, delimiter)
+
+
+def ioutils_dbres_print_yaml(ctx, res):
+    """print a database result as a YAML list"""
+    import yaml
+
+    nrows = 0
+    for rows in ioutils_dbres_batches(ctx, res):
+        sys.stdout.write(yaml.dump([dict(r) for r in rows], indent=4))
+        nrows += len(rows)
+    if nrows == 0:
+        sys.stdout.write(yaml.dump([], indent=4))
+    print()
+    print()
+
+
+def ioutils_dbres_print_dict(ctx, res):
+    """print a database result as Python dictionaries"""
+    for rows in ioutils_dbres_batches(ctx, res):
+        for row in rows:
             print(dict(row))
             # pprint.pprint(dict(row), indent=4)
             print()
-    elif oformat == "table":
-        arows = res.fetchall()
-        dcols = dict((k, k) for k in res.keys())
-        drows = [dict(r) for r in arows]
-        gstring = tabulate(drows, headers=dcols, tablefmt=ostyle)
-        print(gstring)
-    else:
-        allrows = res.fetchall()
-        print(allrows)
+
+
+def ioutils_dbres_print_table(ctx, ostyle, res):
+    """print a database result as a table"""
+    if ostyle in ioutils_table_styles:
+        ioutils_table_print(
+            ctx, ostyle, list(res.keys()), ioutils_dbres_batches(ctx, res)
+        )
+        return
+    from tabulate import tabulate
+
+    arows = []
+    for rows in ioutils_dbres_batches(ctx, res):
+        arows.extend(tuple(r) for r in rows)
+    gstring = tabulate(arows, headers=list(res.keys()), tablefmt=ostyle)
+    print(gstring)
+
+
+def ioutils_dbres_print_raw(ctx, res):
+    """print a database result as the list of row representations"""
+    nrows = 0
+    sys.stdout.write("[")
+    for rows in ioutils_dbres_batches(ctx, res):
+        sys.stdout.write(
+            ("" if nrows == 0 else ", ") + ", ".join(repr(r) for r in rows)
+        )
+        nrows += len(rows)
+    sys.stdout.write("]\n")
 
 
 def ioutils_dict_print(ctx, oformat, ostyle, res):
@@ -97,9 +406,21 @@ def ioutils_dict_print(ctx, oformat, ostyle, res):
     if oformat == "json":
         jdata = []
         jdata.append(res)
-        print(json.dumps(jdata, indent=4))
+        print(iojson_dumps(jdata, pretty=True))
         print()
+    elif oformat == "ndjson":
+        print(iojson_dumps(res))
+    elif oformat == "csv":
+        writer = csv.writer(
+            sys.stdout,
+            delimiter=ioutils_csv_delimiter(ctx),
+            lineterminator="\n",
+        )
+        writer.writerow(res.keys())
+        writer.writerow([ioutils_csv_value(v) for v in res.values()])
     elif oformat == "yaml":
+        import yaml
+
         ydata = []
         ydata.append(res)
         print(yaml.dump(ydata, indent=4))
@@ -109,6 +430,8 @@ def ioutils_dict_print(ctx, oformat, ostyle, res):
         # pprint.pprint(dict(row), indent=4)
         print()
     elif oformat == "table":
+        from tabulate import tabulate
+
         gstring = tabulate([res.values()], headers=res.keys(), tablefmt=ostyle)
         print(gstring)
     else:
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Benchmark of the JSON backends used by kamcli
+
+Builds a synthetic ul.dump response with many contacts and measures, for
+each JSON backend that can be loaded (json, orjson, ujson):
+
+  * decode: iojson_loads() of the response
+  * encode: iojson_dumps() of the decoded response, pretty formatted
+  * print: command_ctl_response_print() of the response with json format
+
+Usage (from the top folder of kamcli sources):
+
+  python3 misc/benchmarks/bench_iojson.py [contacts] [rounds]
+"""
+
+import os
+import sys
+import time
+import importlib
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+)
+
+import kamcli.iojson as iojson  # noqa: E402
+from kamcli.iorpc import command_ctl_response_print  # noqa: E402
+
+
+def bench_uldump(contacts):
+    """Return a ul.dump response with the number of contacts"""
+    aors = []
+    for i in range(contacts):
+        aors.append(
+            {
+                "Info": {
+                    "AoR": "user" + str(i),
+                    "HashID": 1000000 + i,
+                    "Contacts": [
+                        {
+                            "Contact": {
+                                "Address": "sip:user"
+                                + str(i)
+                                + "@10.0.0."
+                                + str(i % 250)
+                                + ":5060;transport=udp",
+                                "Expires": 3600,
+                                "Q": -1,
+                                "Call-ID": "call" + str(i) + "@10.0.0.1",
+                                "CSeq": 2,
+                                "User-Agent": "kamcli benchmark ua",
+                                "Received": "[not set]",
+                                "Path": "[not set]",
+                                "State": "CS_NEW",
+                                "Flags": 0,
+                                "CFlags": 0,
+                                "Socket": "udp:10.1.1.1:5060",
+                                "Methods": 8191,
+                                "Ruid": "uloc-5f3c-" + str(i),
+                                "Instance": "[not set]",
+                                "Reg-Id": 0,
+                                "Server-Id": 0,
+                                "Tcpconn-Id": -1,
+                                "Keepalive": 0,
+                                "Last-Keepalive": 1600000000,
+                                "KA-Roundtrip": 0,
+                                "Last-Modified": 1600000000,
+                            }
+                        }
+                    ],
+                }
+            }
+        )
+    rdata = {
+        "jsonrpc": "2.0",
+        "result": {
+            "Domains": [
+                {
+                    "Domain": {
+                        "Domain": "location",
+                        "Size": 1024,
+                        "AoRs": aors,
+                        "Stats": {"Records": contacts, "Max-Slots": 1},
+                    }
+                }
+            ]
+        },
+        "id": 1,
+    }
+    return iojson.iojson_dumpb(rdata)
+
+
+def bench_run(name, func, rounds):
+    best = None
+    for r in range(rounds):
+        tstart = time.perf_counter()
+        func()
+        tval = time.perf_counter() - tstart
+        if best is None or tval < best:
+            best = tval
+    print("  {:<8} {:8.3f}s".format(name, best))
+
+
+def main():
+    contacts = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    response = bench_uldump(contacts)
+    print(
+        "ul.dump with {} contacts - {:.1f}MB - best of {} rounds".format(
+            contacts, len(response) / 1048576.0, rounds
+        )
+    )
+    devnull = open(os.devnull, "w")
+    for lib in ["json", "orjson", "ujson"]:
+        if lib != "json":
+            try:
+                setattr(iojson, lib, importlib.import_module(lib))
+            except ImportError:
+                print(lib + ": not installed")
+                continue
+        iojson.iojson_lib = lib
+        print(lib + ":")
+        rdata = iojson.iojson_loads(response)
+        bench_run("decode", lambda: iojson.iojson_loads(response), rounds)
+        bench_run(
+            "encode", lambda: iojson.iojson_dumps(rdata, pretty=True), rounds
+        )
+        bench_run(
+            "print",
+            lambda: command_ctl_response_print(response, "json", devnull),
+            rounds,
+        )
+    devnull.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Startup cost of kamcli commands
+
+Runs in new Python processes the import of kamcli and the loading of the
+command (by default 'uptime'), the same as done when kamcli is started,
+and reports the median time. It fails (exit code 1) if heavy packages not
+needed by the command are imported or if the time is over the limit.
+
+Usage (from the top folder of kamcli sources):
+
+  python3 misc/benchmarks/bench_startup.py [-r rounds] [-m max-ms] [command]
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+##
+# packages that must be loaded only by the code that uses them
+BENCH_HEAVY_MODULES = [
+    "sqlalchemy",
+    "prompt_toolkit",
+    "pygments",
+    "yaml",
+    "tabulate",
+    "asyncio",
+]
+
+BENCH_STARTUP_CODE = """
+import sys, time, json
+tstart = time.perf_counter()
+from kamcli.cli import cli
+cmd = cli.get_command(None, sys.argv[1])
+tval = time.perf_counter() - tstart
+print(json.dumps({
+    "found": cmd is not None,
+    "ms": tval * 1000.0,
+    "heavy": [m for m in sys.argv[2:] if m in sys.modules],
+}))
+"""
+
+
+def bench_startup_run(srcdir, command):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = srcdir + os.pathsep + env.get("PYTHONPATH", "")
+    out = subprocess.check_output(
+        [sys.executable, "-c", BENCH_STARTUP_CODE, command]
+        + BENCH_HEAVY_MODULES,
+        env=env,
+    )
+    return json.loads(out)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", nargs="?", default="uptime")
+    parser.add_argument("-r", "--rounds", type=int, default=10)
+    parser.add_argument("-m", "--max-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    srcdir = os.path.abspath(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    )
+    # first run to have the byte-code compiled
+    res = bench_startup_run(srcdir, args.command)
+    if not res["found"]:
+        print("command not found: " + args.command)
+        return 1
+    vals = []
+    for r in range(args.rounds):
+        vals.append(bench_startup_run(srcdir, args.command)["ms"])
+    tval = statistics.median(vals)
+    print(
+        "command {}: median {:.1f}ms - min {:.1f}ms - max {:.1f}ms".format(
+            args.command, tval, min(vals), max(vals)
+        )
+    )
+    ret = 0
+    if res["heavy"]:
+        print("heavy packages imported: " + ", ".join(res["heavy"]))
+        ret = 1
+    if args.max_ms > 0 and tval > args.max_ms:
+        print("over the limit of {:.1f}ms".format(args.max_ms))
+        ret = 1
+    return ret
+
+
+if __name__ == "__main__":
+    sys.exit(main())
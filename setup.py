@@ -15,6 +15,10 @@ setup(
         "tabulate",
         "wheel",
     ],
+    extras_require={
+        "fastjson": ["orjson"],
+        "export": ["pyarrow"],
+    },
     entry_points="""
         [console_scripts]
         kamcli=kamcli.cli:cli